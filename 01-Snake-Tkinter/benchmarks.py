@@ -0,0 +1,504 @@
+# -*- coding: utf-8 -*-
+"""性能基准 - 对比优化实现与朴素实现的耗时。
+
+用法：
+    python benchmarks.py region [--cols 60 --rows 40 --ticks 2000]
+    python benchmarks.py bitboard [--sizes 32 64 128 256]
+    python benchmarks.py alloc [--cols 30 --rows 20 --ticks 10000]
+    python benchmarks.py level [--level levels/arena.txt --ticks 2000]
+    python benchmarks.py export [--cols 30 --rows 20 --ticks 2000]
+    python benchmarks.py endgame [--cols 20 --rows 20 --free 40 --games 6]
+"""
+
+import argparse
+import io
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from bitboard import Bitboard
+from endgame import ENDGAME_FREE_THRESHOLD
+from engine import DIRECTION_DELTAS, SnakeEngine
+from export import FrameRenderer, GifWriter, encode_indexed_png, encode_png, export_palette
+from level import Level
+from region import RegionTracker
+
+
+def _timed(func: Callable[[], object]) -> float:
+    """运行一次函数并返回耗时（秒）。"""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def naive_region_size(cols: int, rows: int, blocked: Set[Tuple[int, int]],
+                      start: Tuple[int, int]) -> int:
+    """朴素泛洪：每次从头计算可到达区域大小。"""
+    if start in blocked:
+        return 0
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        for nx, ny in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+            if 0 <= nx < cols and 0 <= ny < rows and (nx, ny) not in blocked and (nx, ny) not in seen:
+                seen.add((nx, ny))
+                queue.append((nx, ny))
+    return len(seen)
+
+
+def naive_place_food(cols: int, rows: int, snake: List[Tuple[int, int]],
+                     rng: random.Random) -> Optional[Tuple[int, int]]:
+    """朴素放置食物：枚举所有格子，逐个检查是否在蛇身列表中。"""
+    empty_cells = [(x, y) for x in range(cols) for y in range(rows) if (x, y) not in snake]
+    if not empty_cells:
+        return None
+    return rng.choice(empty_cells)
+
+
+def naive_bfs(cols: int, rows: int, start: Tuple[int, int], goal: Tuple[int, int],
+              blocked: Set[Tuple[int, int]]) -> Optional[List[Tuple[int, int]]]:
+    """朴素 BFS：坐标元组、字典记录前驱、deque 作为队列。"""
+    queue = deque([start])
+    came_from: Dict[Tuple[int, int], Optional[Tuple[int, int]]] = {start: None}
+    while queue:
+        x, y = queue.popleft()
+        if (x, y) == goal:
+            path = []
+            current: Optional[Tuple[int, int]] = goal
+            while current is not None:
+                path.append(current)
+                current = came_from[current]
+            path.reverse()
+            return path
+        for nx, ny in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+            if not (0 <= nx < cols and 0 <= ny < rows) or (nx, ny) in blocked or (nx, ny) in came_from:
+                continue
+            came_from[(nx, ny)] = (x, y)
+            queue.append((nx, ny))
+    return None
+
+
+def _record_game(cols: int, rows: int, ticks: int, seed: int) -> List[Tuple[Tuple[int, int], Optional[Tuple[int, int]]]]:
+    """用 AI 引擎跑一局，记录每个 tick 的蛇头与移出的蛇尾。"""
+    engine = SnakeEngine(cols, rows, auto_play=True, rng=random.Random(seed))
+    steps: List[Tuple[Tuple[int, int], Optional[Tuple[int, int]]]] = []
+
+    class Recorder:
+        def on_reset(self, engine: SnakeEngine) -> None:
+            pass
+
+        def on_step(self, engine: SnakeEngine, new_head: Tuple[int, int],
+                    removed_tail: Optional[Tuple[int, int]]) -> None:
+            steps.append((new_head, removed_tail))
+
+        def on_game_over(self, engine: SnakeEngine) -> None:
+            pass
+
+    engine.reset()
+    engine.add_listener(Recorder())
+    initial = list(engine.snake)
+    while len(steps) < ticks and not engine.game_over:
+        engine.step()
+    return [(cell, None) for cell in initial] + steps
+
+
+def bench_region(cols: int, rows: int, ticks: int, seed: int = 0) -> Dict[str, float]:
+    """对比区域追踪器与朴素泛洪回答三个候选格子区域大小的耗时。
+
+    Returns:
+        各实现的总耗时（秒）及每个 tick 的平均耗时（微秒）
+    """
+    steps = _record_game(cols, rows, ticks, seed)
+
+    def candidates(head: Tuple[int, int]) -> List[Tuple[int, int]]:
+        x, y = head
+        return [(nx, ny) for nx, ny in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y))
+                if 0 <= nx < cols and 0 <= ny < rows]
+
+    def run_tracker() -> None:
+        tracker = RegionTracker(cols, rows)
+        for head, tail in steps:
+            tracker.occupy(*head)
+            if tail is not None:
+                tracker.release(*tail)
+            for cell in candidates(head):
+                tracker.region_size(*cell)
+
+    def run_naive() -> None:
+        body: Set[Tuple[int, int]] = set()
+        for head, tail in steps:
+            body.add(head)
+            if tail is not None:
+                body.discard(tail)
+            for cell in candidates(head):
+                naive_region_size(cols, rows, body, cell)
+
+    tracker_time = _timed(run_tracker)
+    naive_time = _timed(run_naive)
+    count = max(len(steps), 1)
+    return {
+        "ticks": len(steps),
+        "tracker_s": tracker_time,
+        "naive_s": naive_time,
+        "tracker_us_per_tick": tracker_time / count * 1e6,
+        "naive_us_per_tick": naive_time / count * 1e6,
+        "speedup": naive_time / tracker_time if tracker_time else float("inf"),
+    }
+
+
+def bench_bitboard(side: int, density: float = 0.2, seed: int = 0) -> Dict[str, float]:
+    """在 side x side 棋盘上对比位棋盘、引擎当前实现与朴素元组实现的放置食物、BFS、泛洪和空闲计数。
+
+    tuple 为朴素的坐标元组实现，engine 为 SnakeEngine 的下标/bytearray 实现（计时前已同步占据表，
+    不含首次重建的开销），bits 为位棋盘实现。
+
+    Returns:
+        各项操作的耗时（毫秒）
+    """
+    rng = random.Random(seed)
+    blocked = {(x, y) for y in range(side) for x in range(side) if rng.random() < density}
+    start, goal = (0, 0), (side - 1, side - 1)
+    blocked.discard(start)
+    blocked.discard(goal)
+    board = Bitboard.from_cells(side, side, blocked)
+
+    # 放置食物：蛇身沿第一行排开
+    engine = SnakeEngine(side, side, rng=random.Random(seed), endgame_threshold=None)
+    engine.snake = [(x, 0) for x in range(side)]
+    engine.place_food()
+    snake_board = Bitboard.from_cells(side, side, set(engine.snake))
+
+    result: Dict[str, float] = {"side": side}
+    result["place_food_tuple_ms"] = _timed(
+        lambda: naive_place_food(side, side, engine.snake, engine.rng)) * 1e3
+    result["place_food_engine_ms"] = _timed(engine.place_food) * 1e3
+    result["place_food_bits_ms"] = _timed(lambda: snake_board.random_free_cell(engine.rng)) * 1e3
+    result["bfs_tuple_ms"] = _timed(lambda: naive_bfs(side, side, start, goal, blocked)) * 1e3
+    result["bfs_engine_ms"] = _timed(lambda: engine.bfs(start, goal, blocked)) * 1e3
+    result["bfs_bits_ms"] = _timed(lambda: board.shortest_path(start, goal)) * 1e3
+    result["flood_tuple_ms"] = _timed(lambda: naive_region_size(side, side, blocked, start)) * 1e3
+    result["flood_bits_ms"] = _timed(lambda: board.region_size(*start)) * 1e3
+    result["free_count_tuple_ms"] = _timed(
+        lambda: sum(1 for y in range(side) for x in range(side) if (x, y) not in blocked)) * 1e3
+    result["free_count_bits_ms"] = _timed(board.free_count) * 1e3
+    return result
+
+
+def measure_tick_allocations(engine: SnakeEngine, ticks: int = 10000,
+                             warmup: int = 500, reset: bool = True) -> Dict[str, int]:
+    """用 tracemalloc 测量稳态 tick 的内存分配。
+
+    只统计既没有吃到食物也没有结束游戏的 tick：吃食物时蛇身变长、重开时重置棋盘，
+    这两类 tick 的分配是预期内的。每个 tick 前后读取当前已分配字节数，并记录 tick 内的峰值。
+
+    残局求解器启用后（空闲格子不超过阈值）不在无分配保证之内：每次搜索会复制占据表、
+    新建候选列表，置换表也会增长到容量上限。测量残局时传入 reset=False 从已摆好的局面开始。
+
+    Args:
+        engine: 待测引擎（通常开启 AI 模式）
+        ticks: 测量的 tick 数
+        warmup: 开始测量前先运行的 tick 数，用于填满缓存和列表容量
+        reset: 开始前是否重置引擎
+
+    Returns:
+        稳态 tick 数、净分配字节数、净分配块数和单个 tick 内的最大瞬时分配字节数
+    """
+    if reset:
+        engine.reset()
+    for _ in range(warmup):
+        if engine.game_over:
+            engine.reset()
+        engine.step()
+
+    steady = 0
+    net_bytes = 0
+    net_blocks = 0
+    peak_bytes = 0
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        for _ in range(ticks):
+            if engine.game_over:
+                engine.reset()
+                continue
+            score = engine.score
+            tracemalloc.reset_peak()
+            blocks_before = sys.getallocatedblocks()
+            before = tracemalloc.get_traced_memory()[0]
+            engine.step()
+            current, peak = tracemalloc.get_traced_memory()
+            blocks = sys.getallocatedblocks() - blocks_before
+            if engine.score != score or engine.game_over:
+                continue
+            steady += 1
+            net_bytes += current - before
+            net_blocks += blocks
+            peak_bytes = max(peak_bytes, peak - before)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return {
+        "steady_ticks": steady,
+        "net_bytes": net_bytes,
+        "net_blocks": net_blocks,
+        "peak_tick_bytes": peak_bytes,
+    }
+
+
+def bench_level(path: str, ticks: int, seed: int = 0) -> Dict[str, float]:
+    """对比关卡距离场的首次计算与缓存加载耗时，以及 AI 使用距离场前后的 tick 耗时。
+
+    Returns:
+        构建/加载耗时（毫秒）与每个 tick 的平均耗时（微秒）
+    """
+    level = Level.load(path)
+    result: Dict[str, float] = {"cells": level.cols * level.rows}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        def build() -> SnakeEngine:
+            return SnakeEngine(level.cols, level.rows, auto_play=True, rng=random.Random(seed),
+                               level=level, distance_cache_dir=cache_dir)
+
+        result["first_load_ms"] = _timed(build) * 1e3
+        result["cached_load_ms"] = _timed(build) * 1e3
+        for name, use_field in (("bfs", False), ("field", True)):
+            engine = build()
+            field = engine.distances
+            if not use_field:
+                engine.distances = None
+            engine.reset()
+
+            def run() -> None:
+                for _ in range(ticks):
+                    if engine.game_over:
+                        engine.reset()
+                    engine.step()
+
+            result[f"{name}_us_per_tick"] = _timed(run) / ticks * 1e6
+            if field is not None:
+                field.close()
+    return result
+
+
+def bench_export(cols: int, rows: int, ticks: int, seed: int = 0,
+                 cell_size: int = 8) -> Dict[str, float]:
+    """测量无界面导出每秒能处理的帧数：只渲染、渲染 + PNG、渲染 + GIF。
+
+    先录下一局的引擎事件再回放给渲染器，计时不包含 AI 寻路。
+
+    Returns:
+        各项每秒帧数
+    """
+    steps = _record_game(cols, rows, ticks, seed)
+    # 记录的前几项是初始蛇身
+    length = len(SnakeEngine(cols, rows).level.start_cells())
+    initial = [cell for cell, _ in steps[:length]]
+    steps = steps[length:]
+    engine = SnakeEngine(cols, rows)
+
+    def replay(on_frame: Callable[[FrameRenderer], None]) -> None:
+        renderer = FrameRenderer(cols, rows, cell_size)
+        renderer.draw_state(initial, None)
+        for head, tail in steps:
+            renderer.on_step(engine, head, tail)
+            on_frame(renderer)
+
+    def gif_frames() -> None:
+        writer = GifWriter(io.BytesIO(), cols * cell_size, rows * cell_size,
+                           export_palette())
+        replay(writer.write)
+        writer.close()
+
+    count = max(len(steps), 1)
+    result: Dict[str, float] = {"frames": len(steps)}
+    result["render_fps"] = count / _timed(lambda: replay(lambda r: None))
+    result["png_rgb_fps"] = count / _timed(lambda: replay(
+        lambda r: encode_png(r.width, r.height, r.rgb)))
+    result["png_indexed_fps"] = count / _timed(lambda: replay(
+        lambda r: encode_indexed_png(r.width, r.height, r.indexed, r.palette)))
+    result["gif_fps"] = count / _timed(gif_frames)
+    return result
+
+
+def random_hamiltonian_cycle(cols: int, rows: int, rng: random.Random,
+                             moves: Optional[int] = None) -> List[Tuple[int, int]]:
+    """生成一条经过所有格子、首尾相邻的随机路径（格子数须为偶数）。
+
+    从蛇形折线出发反复做 backbite 变换打乱：取路径末端的某个相邻格子（必在路径上），
+    把它之后的一段反转，新的末端仍在路径上。打乱足够次数后，继续变换直到首尾相邻。
+
+    Args:
+        cols: 棋盘列数
+        rows: 棋盘行数
+        rng: 随机数生成器
+        moves: 至少变换的次数，默认为格子数的 20 倍
+
+    Returns:
+        格子坐标列表
+
+    Raises:
+        ValueError: 格子数为奇数（不存在这样的回路）
+    """
+    if cols * rows % 2 or min(cols, rows) < 2:
+        raise ValueError(f"{cols}x{rows} 的棋盘不存在哈密顿回路")
+    path = []
+    for y in range(rows):
+        xs = range(cols) if y % 2 == 0 else range(cols - 1, -1, -1)
+        path.extend((x, y) for x in xs)
+    if moves is None:
+        moves = 20 * cols * rows
+    position = {cell: k for k, cell in enumerate(path)}
+    done = 0
+    while True:
+        (first_x, first_y), (last_x, last_y) = path[0], path[-1]
+        if done >= moves and abs(first_x - last_x) + abs(first_y - last_y) == 1:
+            return path
+        done += 1
+        if rng.random() < 0.5:
+            path.reverse()
+            position = {cell: k for k, cell in enumerate(path)}
+            last_x, last_y = path[-1]
+        _, dx, dy = DIRECTION_DELTAS[rng.randrange(4)]
+        k = position.get((last_x + dx, last_y + dy), -1)
+        if k < 0 or k == len(path) - 2:
+            continue
+        path[k + 1:] = path[:k:-1]
+        for i in range(k + 1, len(path)):
+            position[path[i]] = i
+
+
+def endgame_position(engine: SnakeEngine, free: int, rng: random.Random) -> None:
+    """把引擎（无关卡的空棋盘）摆成残局：蛇身沿随机回路铺开，只留下 free 个空闲格子。
+
+    空闲格子是回路的剩余部分，首尾分别与蛇头、蛇尾相邻，所以初始局面总是安全的。
+
+    Args:
+        engine: 引擎，会被重置
+        free: 空闲格子数
+        rng: 随机数生成器
+    """
+    path = random_hamiltonian_cycle(engine.cols, engine.rows, rng)
+    engine.reset()
+    engine.snake = path[:len(path) - free]
+    (head_x, head_y), (neck_x, neck_y) = engine.snake[-1], engine.snake[-2]
+    for name, dx, dy in DIRECTION_DELTAS:
+        if (neck_x + dx, neck_y + dy) == (head_x, head_y):
+            engine.direction = engine.pending_direction = name
+    engine.score = 0
+    engine.place_food()
+
+
+def bench_endgame(cols: int, rows: int, free: int, games: int, seed: int = 0,
+                  threshold: int = ENDGAME_FREE_THRESHOLD) -> Dict[str, float]:
+    """从随机残局出发分别用贪心策略和残局求解器玩下去，对比填满棋盘的局数与单 tick 耗时。
+
+    连续 4 倍格子数的 tick 没吃到食物就视为卡住，结束该局。求解器自己在连续格子数个 tick
+    没吃到食物后会交给贪心策略（solver_giveups 记录次数），所以正常情况下不会卡住。
+    """
+    stall_limit = 4 * cols * rows
+    result: Dict[str, float] = {}
+    for name, endgame_threshold in (("greedy", None), ("solver", threshold)):
+        filled = 0
+        stalled = 0
+        left = 0
+        worst = 0.0
+        nodes = 0
+        search_time = 0.0
+        lookups = 0
+        hits = 0
+        giveups = 0
+        for game in range(games):
+            engine = SnakeEngine(cols, rows, auto_play=True, rng=random.Random(seed + game),
+                                 endgame_threshold=endgame_threshold)
+            endgame_position(engine, free, random.Random(seed + game))
+            length = len(engine.snake)
+            last_eat = 0
+            while not engine.game_over and engine.tick - last_eat < stall_limit:
+                worst = max(worst, _timed(engine.step))
+                if len(engine.snake) != length:
+                    length = len(engine.snake)
+                    last_eat = engine.tick
+            remaining = cols * rows - len(engine.snake)
+            filled += remaining == 0
+            stalled += not engine.game_over
+            left += remaining
+            if engine.endgame is not None:
+                nodes += engine.endgame.nodes
+                search_time += engine.endgame.search_time
+                lookups += engine.endgame.lookups
+                hits += engine.endgame.hits
+                giveups += engine.endgame.giveups
+        result[f"{name}_filled"] = filled
+        result[f"{name}_stalled"] = stalled
+        result[f"{name}_free_left_avg"] = left / games
+        result[f"{name}_worst_tick_ms"] = worst * 1000
+        if endgame_threshold is not None:
+            result[f"{name}_giveups"] = giveups
+    result["solver_nodes_per_sec"] = nodes / search_time if search_time else 0.0
+    result["solver_hit_rate"] = hits / lookups if lookups else 0.0
+    result["games"] = games
+    return result
+
+
+# 各基准的默认棋盘尺寸和 tick 数，与模块文档中的用法一致
+_DEFAULTS: Dict[str, Dict[str, int]] = {
+    "region": {"cols": 60, "rows": 40, "ticks": 2000},
+    "bitboard": {},
+    "alloc": {"cols": 30, "rows": 20, "ticks": 10000},
+    "level": {"ticks": 2000},
+    "export": {"cols": 30, "rows": 20, "ticks": 2000},
+    "endgame": {"cols": 20, "rows": 20},
+}
+
+
+def _print_result(name: str, result: Dict[str, float]) -> None:
+    """打印基准结果。"""
+    print(f"[{name}]")
+    for key, value in result.items():
+        if isinstance(value, float):
+            print(f"  {key}: {value:.3f}")
+        else:
+            print(f"  {key}: {value}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """命令行入口。"""
+    parser = argparse.ArgumentParser(description="贪吃蛇性能基准")
+    parser.add_argument("name", choices=["region", "bitboard", "alloc", "level", "export", "endgame"])
+    parser.add_argument("--cols", type=int, default=None)
+    parser.add_argument("--rows", type=int, default=None)
+    parser.add_argument("--ticks", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[32, 64, 128, 256])
+    parser.add_argument("--level", default="levels/arena.txt")
+    parser.add_argument("--free", type=int, default=ENDGAME_FREE_THRESHOLD)
+    parser.add_argument("--games", type=int, default=6)
+    args = parser.parse_args(argv)
+    for key, value in _DEFAULTS[args.name].items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+
+    if args.name == "region":
+        _print_result("region", bench_region(args.cols, args.rows, args.ticks, args.seed))
+    elif args.name == "bitboard":
+        for side in args.sizes:
+            _print_result(f"bitboard {side}x{side}", bench_bitboard(side, seed=args.seed))
+    elif args.name == "alloc":
+        engine = SnakeEngine(args.cols, args.rows, auto_play=True, rng=random.Random(args.seed))
+        _print_result("alloc", measure_tick_allocations(engine, args.ticks))
+    elif args.name == "level":
+        _print_result(f"level {args.level}", bench_level(args.level, args.ticks, args.seed))
+    elif args.name == "export":
+        _print_result("export", bench_export(args.cols, args.rows, args.ticks, args.seed))
+    elif args.name == "endgame":
+        result = bench_endgame(args.cols, args.rows, args.free, args.games, args.seed)
+        _print_result(f"endgame {args.cols}x{args.rows} free={args.free}", result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""位棋盘 - 用 Python 任意精度整数表示整块棋盘，以整数位运算代替逐格循环。
+
+第 (x, y) 格对应第 y * stride + x 位，stride = cols + 1。每行末尾多出的一列填充位
+始终不属于棋盘，左右移位时越界的位会落在填充列上并被棋盘掩码清除，不会卷到相邻行。
+
+    碰撞检测：occupied & bit，一次与运算
+    BFS/泛洪：(b << 1 | b >> 1 | b << stride | b >> stride) & free，一次扩展整个边界
+    空闲格子数：free.bit_count()
+"""
+
+import random
+from typing import Iterator, List, Optional, Set, Tuple
+
+from endgame import ENDGAME_FREE_THRESHOLD
+from engine import SnakeEngine
+from level import Level
+
+
+class Bitboard:
+    """用整数位图表示的棋盘占据状态。
+
+    Attributes:
+        cols: 棋盘列数
+        rows: 棋盘行数
+        stride: 每行位数（含一列填充位）
+        board_mask: 所有合法格子的位掩码
+        occupied: 被占据格子的位掩码
+    """
+
+    def __init__(self, cols: int, rows: int):
+        """初始化空棋盘。
+
+        Args:
+            cols: 棋盘列数
+            rows: 棋盘行数
+        """
+        self.cols = cols
+        self.rows = rows
+        self.stride = cols + 1
+        self.row_mask = (1 << cols) - 1
+        board_mask = 0
+        for y in range(rows):
+            board_mask |= self.row_mask << (y * self.stride)
+        self.board_mask = board_mask
+        self.occupied = 0
+
+    @classmethod
+    def from_cells(cls, cols: int, rows: int, cells: Set[Tuple[int, int]]) -> "Bitboard":
+        """由被占据格子集合构造位棋盘。"""
+        board = cls(cols, rows)
+        board.occupied = board.mask_of(cells)
+        return board
+
+    def bit(self, x: int, y: int) -> int:
+        """返回格子对应的单个位。"""
+        return 1 << (y * self.stride + x)
+
+    def mask_of(self, cells: Set[Tuple[int, int]]) -> int:
+        """把一组格子转换为位掩码，忽略棋盘外的格子。"""
+        mask = 0
+        stride = self.stride
+        for x, y in cells:
+            if 0 <= x < self.cols and 0 <= y < self.rows:
+                mask |= 1 << (y * stride + x)
+        return mask
+
+    def cell_of(self, bit: int) -> Tuple[int, int]:
+        """返回单个位对应的格子坐标。"""
+        index = bit.bit_length() - 1
+        return index % self.stride, index // self.stride
+
+    def cells(self, mask: int) -> Iterator[Tuple[int, int]]:
+        """按位序遍历掩码中的格子。"""
+        while mask:
+            low = mask & -mask
+            yield self.cell_of(low)
+            mask ^= low
+
+    @property
+    def free(self) -> int:
+        """空闲格子的位掩码。"""
+        return self.board_mask & ~self.occupied
+
+    def occupy(self, x: int, y: int) -> None:
+        """占据一个格子。"""
+        self.occupied |= 1 << (y * self.stride + x)
+
+    def release(self, x: int, y: int) -> None:
+        """释放一个格子。"""
+        self.occupied &= ~(1 << (y * self.stride + x))
+
+    def is_occupied(self, x: int, y: int) -> bool:
+        """碰撞检测：一次与运算。"""
+        return bool(self.occupied & (1 << (y * self.stride + x)))
+
+    def free_count(self) -> int:
+        """空闲格子数。"""
+        return self.free.bit_count()
+
+    def dilate(self, mask: int, free: int) -> int:
+        """把掩码向四个方向各扩展一格，并限制在 free 内。"""
+        stride = self.stride
+        return (mask << 1 | mask >> 1 | mask << stride | mask >> stride) & free
+
+    def flood_fill(self, x: int, y: int, free: Optional[int] = None) -> int:
+        """从起点出发的可到达区域（包含起点）。
+
+        Args:
+            x: 起点 X 坐标
+            y: 起点 Y 坐标
+            free: 可通行格子掩码，默认为当前空闲格子
+
+        Returns:
+            可到达区域的位掩码
+        """
+        if free is None:
+            free = self.free
+        stride = self.stride
+        region = 1 << (y * stride + x)
+        frontier = region
+        while frontier:
+            grown = (frontier << 1 | frontier >> 1 | frontier << stride | frontier >> stride) & free
+            frontier = grown & ~region
+            region |= frontier
+        return region
+
+    def region_size(self, x: int, y: int) -> int:
+        """从格子出发可到达的空闲区域大小，格子被占据时为 0。"""
+        if self.is_occupied(x, y):
+            return 0
+        return self.flood_fill(x, y).bit_count()
+
+    def bfs_layers(self, start: Tuple[int, int], goal: Tuple[int, int],
+                   free: int) -> Optional[List[int]]:
+        """按层扩展直到到达终点。
+
+        Args:
+            start: 起点坐标
+            goal: 终点坐标
+            free: 可通行格子掩码（起点不必在其中）
+
+        Returns:
+            每一层新到达的格子掩码，第 0 层为起点；不可达时返回 None
+        """
+        stride = self.stride
+        goal_bit = 1 << (goal[1] * stride + goal[0])
+        frontier = 1 << (start[1] * stride + start[0])
+        visited = frontier
+        layers = [frontier]
+        while not frontier & goal_bit:
+            grown = (frontier << 1 | frontier >> 1 | frontier << stride | frontier >> stride) & free
+            frontier = grown & ~visited
+            if not frontier:
+                return None
+            visited |= frontier
+            layers.append(frontier)
+        return layers
+
+    def nearest_targets(self, start: Tuple[int, int], targets: int, free: int) -> int:
+        """按层扩展直到碰到目标，返回最先到达的那一层中的目标格子。
+
+        Args:
+            start: 起点坐标
+            targets: 目标格子掩码（应在 free 之内）
+            free: 可通行格子掩码（起点不必在其中）
+
+        Returns:
+            同一层最先到达的目标格子掩码，都不可达时返回 0
+        """
+        stride = self.stride
+        frontier = 1 << (start[1] * stride + start[0])
+        visited = frontier
+        while frontier:
+            hit = frontier & targets
+            if hit:
+                return hit
+            grown = (frontier << 1 | frontier >> 1 | frontier << stride | frontier >> stride) & free
+            frontier = grown & ~visited
+            visited |= frontier
+        return 0
+
+    def distance(self, start: Tuple[int, int], goal: Tuple[int, int],
+                 free: Optional[int] = None) -> Optional[int]:
+        """起点到终点的最短步数，不可达时返回 None。"""
+        layers = self.bfs_layers(start, goal, self.free if free is None else free)
+        if layers is None:
+            return None
+        return len(layers) - 1
+
+    def shortest_path(self, start: Tuple[int, int], goal: Tuple[int, int],
+                      free: Optional[int] = None) -> Optional[List[Tuple[int, int]]]:
+        """起点到终点的最短路径（含两端），不可达时返回 None。"""
+        layers = self.bfs_layers(start, goal, self.free if free is None else free)
+        if layers is None:
+            return None
+        stride = self.stride
+        current = 1 << (goal[1] * stride + goal[0])
+        path = [goal]
+        # 从终点逐层回溯，每层取一个与当前格相邻的格子
+        for layer in reversed(layers[:-1]):
+            candidates = (current << 1 | current >> 1 | current << stride | current >> stride) & layer
+            current = candidates & -candidates
+            path.append(self.cell_of(current))
+        path.reverse()
+        return path
+
+    def random_free_cell(self, rng: random.Random) -> Optional[Tuple[int, int]]:
+        """均匀随机选取一个空闲格子，只按行计数而不枚举所有格子。
+
+        Args:
+            rng: 随机数生成器
+
+        Returns:
+            空闲格子坐标，没有空闲格子时返回 None
+        """
+        free = self.free
+        count = free.bit_count()
+        if count == 0:
+            return None
+        k = rng.randrange(count)
+        for y in range(self.rows):
+            row = (free >> (y * self.stride)) & self.row_mask
+            in_row = row.bit_count()
+            if k < in_row:
+                for _ in range(k):
+                    row &= row - 1
+                return (row & -row).bit_length() - 1, y
+            k -= in_row
+        return None
+
+
+class BitboardEngine(SnakeEngine):
+    """使用位棋盘维护占据状态的引擎，碰撞、放置食物、BFS 和 AI 找最近候选都基于整数位运算。
+
+    墙壁和传送门格子始终置位；位并行扩展不认识传送门，有传送门的关卡退回逐格搜索。
+    候选方向的空闲区域大小仍由父类的区域追踪器给出，比逐个泛洪更快。
+    """
+
+    def __init__(self, cols: int, rows: int, auto_play: bool = False,
+                 rng: Optional[random.Random] = None, level: Optional[Level] = None,
+                 distance_cache_dir: Optional[str] = None,
+                 endgame_threshold: Optional[int] = ENDGAME_FREE_THRESHOLD):
+        """初始化引擎。
+
+        Args:
+            cols: 棋盘列数
+            rows: 棋盘行数
+            auto_play: 是否启用 AI 模式
+            rng: 随机数生成器（可选）
+            level: 关卡地图（可选）
+            distance_cache_dir: 距离场缓存目录（可选）
+            endgame_threshold: 启用残局求解的空闲格子数上限，None 表示不启用
+        """
+        self.board = Bitboard(cols, rows)
+        self.static_mask = 0
+        if level is not None:
+            self.static_mask = self.board.mask_of(level.blocked_cells())
+        super().__init__(cols, rows, auto_play=auto_play, rng=rng, level=level,
+                         distance_cache_dir=distance_cache_dir, endgame_threshold=endgame_threshold)
+        # 格子下标 -> 位棋盘中的位，供 AI 构造候选掩码
+        stride = self.board.stride
+        self._cell_bits: List[int] = [1 << (i // cols * stride + i % cols) for i in range(cols * rows)]
+
+    def _rebuild_occupancy(self) -> None:
+        """按当前蛇身重建区域追踪器和位棋盘。"""
+        super()._rebuild_occupancy()
+        self.board.occupied = self.board.mask_of(set(self.snake)) | self.static_mask
+
+    def _occupy_cell(self, x: int, y: int) -> None:
+        """记录格子被蛇头占据。"""
+        super()._occupy_cell(x, y)
+        self.board.occupy(x, y)
+
+    def _release_cell(self, x: int, y: int) -> None:
+        """记录格子被蛇尾释放。"""
+        super()._release_cell(x, y)
+        self.board.release(x, y)
+
+    def _is_occupied(self, x: int, y: int) -> bool:
+        """碰撞检测：一次与运算。"""
+        return self.board.is_occupied(x, y)
+
+    def bfs(self, start: Tuple[int, int], goal: Tuple[int, int],
+            blocked: Set[Tuple[int, int]]) -> Optional[List[Tuple[int, int]]]:
+        """使用位并行扩展寻找从起点到终点的路径。
+
+        Args:
+            start: 起点坐标
+            goal: 终点坐标
+            blocked: 障碍物坐标集合
+
+        Returns:
+            路径坐标列表，如果找不到路径返回 None
+        """
+        if self.level.portals:
+            return super().bfs(start, goal, blocked)
+        free = self.board.board_mask & ~self.board.mask_of(blocked) & ~self.static_mask
+        return self.board.shortest_path(start, goal, free)
+
+    def _nearest_candidate(self, count: int) -> int:
+        """从食物出发按层位并行扩展，找出离食物最近的候选格子。
+
+        与父类的逐格分层 BFS 结果相同：到达层数相同的候选取序号靠前者。
+
+        Args:
+            count: 候选格子数（存放在 _candidate_cells 中）
+
+        Returns:
+            候选格子序号，食物不可达时返回 -1
+        """
+        if self.level.portals:
+            return super()._nearest_candidate(count)
+        food = self.food
+        if self.distances is not None:
+            best = self._static_nearest_candidate(count, food[1] * self.cols + food[0])
+            if best != -2:
+                return best
+        cells = self._candidate_cells
+        bits = self._cell_bits
+        targets = 0
+        k = 0
+        while k < count:
+            targets |= bits[cells[k]]
+            k += 1
+        hit = self.board.nearest_targets(food, targets, self.board.free)
+        if not hit:
+            return -1
+        k = 0
+        while not hit & bits[cells[k]]:
+            k += 1
+        return k
+
+    def place_food(self) -> None:
+        """在空白位置放置食物。"""
+        self._sync_occupancy()
+        cell = self.board.random_free_cell(self.rng)
+        if cell is None:
+            self.end_game()
+            return
+        self.food = cell
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""颜色常量 - Tk 界面与无界面导出共用的一套颜色。
+
+颜色用 Tk 颜色名表示。导出图像时按 X11 rgb.txt 的取值换算成 RGB，
+与 Tk 8.6 在 X11 上解析颜色名的结果一致。
+"""
+
+from typing import Dict, Tuple
+
+# 颜色常量
+COLOR_BACKGROUND = "black"
+COLOR_SNAKE_BODY = "green"
+COLOR_SNAKE_HEAD = "lime"
+COLOR_FOOD = "red"
+COLOR_WALL = "gray"
+COLOR_PORTAL = "purple"
+COLOR_TEXT = "white"
+
+# 用到的颜色名对应的 RGB（X11 中 green 与 lime 取值相同）
+NAMED_COLORS: Dict[str, Tuple[int, int, int]] = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "green": (0, 255, 0),
+    "lime": (0, 255, 0),
+    "gray": (190, 190, 190),
+    "purple": (160, 32, 240),
+}
+
+
+def to_rgb(color: str) -> Tuple[int, int, int]:
+    """把 Tk 颜色名或 #rrggbb / #rgb 转换为 RGB。
+
+    Args:
+        color: 颜色
+
+    Returns:
+        (r, g, b)
+
+    Raises:
+        ValueError: 无法识别的颜色
+    """
+    if color.startswith("#"):
+        digits = color[1:]
+        if len(digits) == 3:
+            digits = "".join(c * 2 for c in digits)
+        if len(digits) == 6:
+            return int(digits[0:2], 16), int(digits[2:4], 16), int(digits[4:6], 16)
+        raise ValueError(f"无法识别的颜色: {color}")
+    key = color.replace(" ", "").lower()
+    if key not in NAMED_COLORS:
+        raise ValueError(f"无法识别的颜色: {color}")
+    return NAMED_COLORS[key]
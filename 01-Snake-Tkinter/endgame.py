@@ -0,0 +1,567 @@
+# -*- coding: utf-8 -*-
+"""残局求解 - 空闲格子很少时，用精确的深度优先搜索代替贪心寻路。
+
+搜索只在“安全”的状态之间进行：蛇头挨着与蛇尾连通的空闲区域。这时沿该区域走到蛇尾，
+再一直跟着蛇尾原来的轨迹走，每一格都会在蛇头到达之前腾空，蛇可以无限存活。
+目标是找到一串移动，吃到食物后仍然安全，并且这片空闲区域至少还剩两格：
+下一个食物刷在蛇头唯一的出口上时，吃掉它也不会被堵死。吃完后棋盘填满也算成功。
+
+搜索按迭代加深进行（深度上限依次翻倍），先找短方案；每个 tick 有节点预算（而不是时间预算，
+所以同一个随机种子的对局在不同机器上走法相同，可以复现），
+找到的移动序列会缓存下来在后续 tick 中依次执行。预算内没有结果时，
+沿中止时正在搜索的路线走一步（路线上每个状态都是安全的），下个 tick 从这一步出发，
+以同一个搜索终点（上次的深度上限减去已走的步数）接着搜索。
+一直找不到方案时蛇可以安全地无限绕圈，所以连续 stall_ticks 个 tick 没吃到食物后
+交还给引擎的贪心策略直奔食物（可能因此撞死），吃到食物后再恢复搜索，保证对局会结束。
+
+状态用 Zobrist 哈希表示：每节蛇身按“所在格子 + 指向下一节的方向”取一个随机键，
+再异或上蛇头和食物的键。移动时只需异或进出的几项，哈希同时确定了占据格子和蛇身顺序（包括蛇尾）。
+置换表记录“从该状态出发 k 步内无解”（子树完整搜完、没有碰到深度上限时记为永远无解），
+容量有限，按最近使用淘汰（LRU），跨 tick 保留：
+下一个 tick 从上次搜索树的子节点出发，搜索终点不变，上次已搜完的子树可以直接命中。
+
+求解器启用时不遵守引擎 tick 路径的无分配约定：每次搜索复制占据表、计算到食物的静态距离，
+每个节点新建候选列表，置换表增长到 table_size 后才停止。分配量有界，不随 tick 数持续增长，
+test_allocations 对此有单独的检查。
+"""
+
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+# 空闲格子数不超过该值时启用残局求解
+ENDGAME_FREE_THRESHOLD = 40
+
+# 每个 tick 最多扩展的节点数（约 20 毫秒）
+ENDGAME_NODE_BUDGET = 2000
+
+# 每个 tick 的搜索时间上限（毫秒），只在机器过慢时兜底，触发后对局不再可复现
+ENDGAME_TIME_LIMIT_MS = 100.0
+
+# 置换表容量
+ENDGAME_TABLE_SIZE = 1 << 16
+
+# 搜索深度上限（同时限制递归深度）
+ENDGAME_MAX_DEPTH = 600
+
+# 迭代加深的初始深度
+ENDGAME_FIRST_DEPTH = 8
+
+# 没有吃到食物的 tick 数达到“格子数 x 该倍数”后交给贪心策略
+ENDGAME_STALL_FACTOR = 1
+
+# 每扩展多少个节点检查一次时间上限
+_DEADLINE_CHECK_INTERVAL = 64
+
+# Zobrist 随机键的种子，固定后同一棋盘的哈希可复现
+ZOBRIST_SEED = 0x5EED
+
+_UNREACHABLE = 1 << 30
+
+# 置换表中“整棵子树已搜完，任何深度都无解”的记录值
+_EXHAUSTED = 1 << 30
+
+
+class EndgameSolver:
+    """残局精确搜索器，由 SnakeEngine.get_ai_direction 在空闲格子不多时调用。
+
+    Attributes:
+        threshold: 启用残局求解的空闲格子数上限
+        node_budget: 每个 tick 最多扩展的节点数
+        time_limit_ms: 每个 tick 的搜索时间上限（毫秒）
+        table_size: 置换表容量
+        max_depth: 搜索深度上限
+        stall_ticks: 连续多少个 tick 没吃到食物后交给贪心策略，None 表示棋盘格子数
+        table: 置换表，哈希 -> 已确定无解的步数（_EXHAUSTED 表示任何深度都无解）
+        searches: 搜索次数
+        solved: 找到方案的搜索次数
+        nodes: 累计扩展的节点数
+        lookups: 累计查询置换表次数
+        hits: 累计命中（剪枝）次数
+        search_time: 累计搜索时间（秒）
+        max_search_ms: 单次搜索的最长时间（毫秒）
+        max_search_nodes: 单次搜索扩展的最多节点数
+        giveups: 因长时间没吃到食物而交给贪心策略的次数
+    """
+
+    def __init__(self, threshold: int = ENDGAME_FREE_THRESHOLD,
+                 node_budget: int = ENDGAME_NODE_BUDGET,
+                 time_limit_ms: float = ENDGAME_TIME_LIMIT_MS,
+                 table_size: int = ENDGAME_TABLE_SIZE, max_depth: int = ENDGAME_MAX_DEPTH,
+                 stall_ticks: Optional[int] = None):
+        """初始化求解器。
+
+        Args:
+            threshold: 启用残局求解的空闲格子数上限
+            node_budget: 每个 tick 最多扩展的节点数
+            time_limit_ms: 每个 tick 的搜索时间上限（毫秒）
+            table_size: 置换表容量
+            max_depth: 搜索深度上限
+            stall_ticks: 连续多少个 tick 没吃到食物后交给贪心策略，默认为棋盘格子数
+        """
+        self.threshold = threshold
+        self.node_budget = node_budget
+        self.time_limit_ms = time_limit_ms
+        self.table_size = table_size
+        self.max_depth = max_depth
+        self.stall_ticks = stall_ticks
+        self.table: "OrderedDict[int, int]" = OrderedDict()
+
+        self.searches = 0
+        self.solved = 0
+        self.nodes = 0
+        self.lookups = 0
+        self.hits = 0
+        self.search_time = 0.0
+        self.max_search_ms = 0.0
+        self.max_search_nodes = 0
+        self.giveups = 0
+
+        self._cells = 0
+        self._link_keys: List[List[int]] = []
+        self._head_keys: List[int] = []
+        self._food_keys: List[int] = []
+        self._mark = bytearray()
+        self._zero_marks = b""
+        self._queue: List[int] = []
+        self._stamp = 0
+
+        # 缓存的移动方案：逆序的方向序号（末尾是下一步），以及执行下一步前引擎应处的状态
+        self._plan: List[int] = []
+        self._plan_state: Optional[tuple] = None
+
+        # 单次搜索的工作状态
+        self._tables: List[List[int]] = []
+        self._neighbors: List[Any] = []
+        self._occupied = bytearray()
+        self._body: Deque[int] = deque()
+        self._links: Deque[int] = deque()
+        self._tail_links: List[int] = []
+        # 每个格子被蛇头占据时的步数（蛇身格子在第 entered + 蛇长 + 1 步起才能再进入）
+        self._entered: List[int] = []
+        self._entered_stack: List[int] = []
+        self._clock = 0
+        self._distance: List[int] = []
+        self._food = 0
+        self._free = 0
+        self._want_room = 0
+        self._hash = 0
+        self._line: List[int] = []
+        self._fallback: List[int] = []
+        self._cutoff = False
+        self._node_limit = 0
+        self._deadline = 0.0
+        # 上次中止的迭代的搜索终点：(tick, 食物下标)
+        self._horizon = (0, -1)
+        # 最近一次蛇身变长时的 (tick, 蛇长)，以及此后是否已交给贪心策略
+        self._progress = (0, 0)
+        self._gave_up = False
+
+    def _prepare(self, cells: int) -> None:
+        """按格子数生成 Zobrist 随机键和搜索缓冲区（棋盘尺寸变化时重新生成）。"""
+        if self._cells == cells:
+            return
+        rng = random.Random(ZOBRIST_SEED)
+        self._link_keys = [[rng.getrandbits(64) for _ in range(cells)] for _ in range(4)]
+        self._head_keys = [rng.getrandbits(64) for _ in range(cells)]
+        self._food_keys = [rng.getrandbits(64) for _ in range(cells)]
+        self._mark = bytearray(cells)
+        self._zero_marks = bytes(cells)
+        self._queue = [0] * cells
+        self._stamp = 0
+        self._cells = cells
+        self.table.clear()
+
+    def is_active(self, engine: Any) -> bool:
+        """空闲格子数不超过阈值时启用。"""
+        occupied = engine._occupied
+        return engine.food is not None and len(occupied) - occupied.count(1) <= self.threshold
+
+    def choose(self, engine: Any) -> Optional[str]:
+        """为引擎选择下一步方向。
+
+        Args:
+            engine: SnakeEngine 实例
+
+        Returns:
+            方向；未启用、找不到安全方向或长时间没吃到食物时返回 None，由引擎的贪心策略决定
+        """
+        tick, length = self._progress
+        if len(engine.snake) != length or engine.tick < tick:
+            self._progress = (engine.tick, len(engine.snake))
+            self._gave_up = False
+        if not self.is_active(engine):
+            self._plan = []
+            return None
+        stall_ticks = self.stall_ticks
+        if stall_ticks is None:
+            stall_ticks = ENDGAME_STALL_FACTOR * engine.cols * engine.rows
+        if engine.tick - self._progress[0] >= stall_ticks:
+            if not self._gave_up:
+                self._gave_up = True
+                self.giveups += 1
+            self._plan = []
+            return None
+        cols = engine.cols
+        head_x, head_y = engine.snake[-1]
+        food_x, food_y = engine.food
+        state = (engine.tick, head_y * cols + head_x, food_y * cols + food_x, len(engine.snake))
+        if not self._plan or state != self._plan_state:
+            self._plan = self._search(engine)
+        if not self._plan:
+            return None
+        direction = self._plan.pop()
+        target = engine._move_tables[direction][1][state[1]]
+        self._plan_state = (state[0] + 1, target, state[2], state[3])
+        return engine._move_tables[direction][0]
+
+    def _search(self, engine: Any) -> List[int]:
+        """从引擎当前状态搜索，返回逆序的方向序号列表，没有安全方向时返回空列表。"""
+        start = time.perf_counter()
+        self._load(engine)
+        start_nodes = self.nodes
+        self._node_limit = start_nodes + self.node_budget
+        self._deadline = start + self.time_limit_ms / 1000
+        self._fallback = []
+
+        # 吃完后至少留两格空闲区域；只剩一格可留时放宽，棋盘填满时不作要求
+        self._want_room = min(2, self._free - 1)
+        max_depth = min(self.max_depth, len(self._body) + self._free)
+        root = self._hash
+        limit = ENDGAME_FIRST_DEPTH
+        horizon, horizon_food = self._horizon
+        if horizon_food == self._food and horizon > engine.tick:
+            limit = max(limit, horizon - engine.tick)
+        limit = min(limit, max_depth)
+        result: Optional[bool] = False
+        while True:
+            self.lookups += 1
+            known = self.table.get(root)
+            if known is not None and known >= limit:
+                # 命中只说明 known 步内无解，除非整棵树已搜完，否则继续加深
+                self.hits += 1
+                self.table.move_to_end(root)
+                if known == _EXHAUSTED or known >= max_depth:
+                    break
+            else:
+                self._line = []
+                self._cutoff = False
+                result = self._dfs(limit)
+                if result is None:
+                    self._horizon = (engine.tick + limit, self._food)
+                if result is not False:
+                    break
+                if not self._cutoff:
+                    # 没有碰到深度上限说明整棵树已搜完，更深也不会有解
+                    self._store(root, _EXHAUSTED)
+                    break
+                self._store(root, limit)
+            if limit >= max_depth:
+                break
+            limit = min(2 * limit, max_depth)
+
+        self.searches += 1
+        if result:
+            self.solved += 1
+            plan = self._line[::-1]
+        elif result is False and self._fallback:
+            # 已确定没有留足余量的方案，退而求其次
+            plan = self._fallback
+        elif result is None and self._line:
+            # 预算用完：沿正在搜索的路线走一步，下个 tick 接着搜这棵子树
+            plan = [self._line[0]]
+        else:
+            plan = []
+            stall = self._stall_move()
+            if stall >= 0:
+                plan.append(stall)
+        elapsed = time.perf_counter() - start
+        self.search_time += elapsed
+        self.max_search_ms = max(self.max_search_ms, elapsed * 1000)
+        self.max_search_nodes = max(self.max_search_nodes, self.nodes - start_nodes)
+        return plan
+
+    def _load(self, engine: Any) -> None:
+        """把引擎当前的蛇身、占据表和食物复制到搜索工作状态中。"""
+        cols = engine.cols
+        self._prepare(engine.cols * engine.rows)
+        self._tables = [table for _, table in engine._move_tables]
+        self._neighbors = engine._neighbor_table
+        self._occupied = bytearray(engine._occupied)
+        self._free = len(self._occupied) - self._occupied.count(1)
+        self._body = deque(y * cols + x for x, y in engine.snake)
+        self._links = deque()
+        self._tail_links = []
+        body = self._body
+        for k in range(len(body) - 1):
+            self._links.append(self._direction_between(body[k], body[k + 1]))
+        self._entered = [0] * self._cells
+        self._entered_stack = []
+        self._clock = 0
+        for k, index in enumerate(body):
+            self._entered[index] = k - len(body) + 1
+        self._food = engine.food[1] * cols + engine.food[0]
+        self._distance = self._static_distance(engine._blocked_cells, self._food)
+        self._hash = self._full_hash()
+
+    def _direction_between(self, a: int, b: int) -> int:
+        """返回从格子 a 走一步到相邻格子 b 的方向序号（考虑传送门）。"""
+        for d, table in enumerate(self._tables):
+            if table[a] == b:
+                return d
+        raise ValueError(f"蛇身格子 {a} 与 {b} 不相邻")
+
+    def _full_hash(self) -> int:
+        """从头计算当前状态的哈希。"""
+        body = self._body
+        value = self._head_keys[body[-1]] ^ self._food_keys[self._food]
+        for k, d in enumerate(self._links):
+            value ^= self._link_keys[d][body[k]]
+        return value
+
+    def _static_distance(self, blocked: bytes, goal: int) -> List[int]:
+        """忽略蛇身时各格到食物的步数，用于排列搜索顺序。"""
+        distance = [_UNREACHABLE] * len(blocked)
+        distance[goal] = 0
+        queue = deque([goal])
+        neighbors = self._neighbors
+        while queue:
+            current = queue.popleft()
+            for n in neighbors[current]:
+                if distance[n] == _UNREACHABLE and not blocked[n]:
+                    distance[n] = distance[current] + 1
+                    queue.append(n)
+        return distance
+
+    def _dfs(self, remaining: int) -> Optional[bool]:
+        """深度受限的深度优先搜索，当前路线上的方向依次存放在 _line 中。
+
+        Args:
+            remaining: 剩余可走步数
+
+        Returns:
+            True 找到方案（_line 即完整方案）；False 在剩余步数内确定无解；
+            None 用完预算中止（_line 为中止时正在搜索的路线）
+
+        返回 False 时，_cutoff 表示子树中是否有分支因深度上限被剪掉（或命中了受深度限制的记录），
+        即结论是否只在剩余步数内成立。
+        """
+        self.nodes += 1
+        if self.nodes > self._node_limit:
+            return None
+        if self.nodes % _DEADLINE_CHECK_INTERVAL == 0 and time.perf_counter() > self._deadline:
+            return None
+        if self._lower_bound() > remaining:
+            self._cutoff = True
+            return False
+
+        occupied = self._occupied
+        head = self._body[-1]
+        distance = self._distance
+        moves = []
+        for d, table in enumerate(self._tables):
+            target = table[head]
+            if target >= 0 and not occupied[target]:
+                moves.append((distance[target], d, target))
+        moves.sort()
+
+        table = self.table
+        line = self._line
+        for _, d, target in moves:
+            line.append(d)
+            if target == self._food:
+                room = self._room_after_eating(target)
+                if room >= self._want_room:
+                    return True
+                if room and not self._fallback:
+                    self._fallback = line[::-1]
+                line.pop()
+                continue
+
+            tail = self._push(d, target)
+            result: Optional[bool] = False
+            if self._room():
+                key = self._hash
+                self.lookups += 1
+                known = table.get(key)
+                if known is not None and known >= remaining - 1:
+                    self.hits += 1
+                    table.move_to_end(key)
+                    if known != _EXHAUSTED:
+                        self._cutoff = True
+                else:
+                    cutoff = self._cutoff
+                    self._cutoff = False
+                    result = self._dfs(remaining - 1)
+                    if result is False:
+                        self._store(key, remaining - 1 if self._cutoff else _EXHAUSTED)
+                    self._cutoff = self._cutoff or cutoff
+            self._pop(tail)
+
+            if result is not False:
+                # 找到方案或预算用完：保留当前路线
+                return result
+            line.pop()
+        return False
+
+    def _lower_bound(self) -> int:
+        """吃到食物至少还要走的步数。
+
+        蛇头要先到达食物的某个邻格：邻格是蛇身时要等它腾空，且不会比忽略蛇身的距离更近。
+        不考虑新长出的蛇身，所以是下界，用来剪枝不影响搜索的精确性。
+        """
+        head = self._body[-1]
+        neighbors = self._neighbors[self._food]
+        if head in neighbors:
+            return 1
+        distance = self._distance
+        occupied = self._occupied
+        entered = self._entered
+        # 蛇身格子在第 entered + 蛇长 + 1 步起才能进入
+        release = len(self._body) + 1 - self._clock
+        approach = distance[head] - 1
+        best = _UNREACHABLE
+        for n in neighbors:
+            if distance[n] == _UNREACHABLE:
+                continue
+            wait = entered[n] + release if occupied[n] else 0
+            steps = approach if approach > wait else wait
+            if steps < best:
+                best = steps
+        return best + 1
+
+    def _push(self, d: int, target: int) -> int:
+        """蛇头沿方向 d 进入 target，蛇尾前移一格，增量更新哈希，返回移出的蛇尾。"""
+        body = self._body
+        links = self._links
+        head = body[-1]
+        tail = body.popleft()
+        tail_link = links.popleft()
+        self._hash ^= (self._head_keys[head] ^ self._link_keys[d][head] ^ self._head_keys[target]
+                       ^ self._link_keys[tail_link][tail])
+        body.append(target)
+        links.append(d)
+        self._occupied[target] = 1
+        self._occupied[tail] = 0
+        # 移出的蛇尾指向和目标格原来的进入步数在撤销时需要恢复
+        self._tail_links.append(tail_link)
+        self._clock += 1
+        self._entered_stack.append(self._entered[target])
+        self._entered[target] = self._clock
+        return tail
+
+    def _pop(self, tail: int) -> None:
+        """撤销一次 _push。"""
+        body = self._body
+        links = self._links
+        target = body.pop()
+        d = links.pop()
+        head = body[-1]
+        tail_link = self._tail_links.pop()
+        self._entered[target] = self._entered_stack.pop()
+        self._clock -= 1
+        body.appendleft(tail)
+        links.appendleft(tail_link)
+        self._occupied[target] = 0
+        self._occupied[tail] = 1
+        self._hash ^= (self._head_keys[head] ^ self._link_keys[d][head] ^ self._head_keys[target]
+                       ^ self._link_keys[tail_link][tail])
+
+    def _store(self, key: int, depth: int) -> None:
+        """记录“该状态在 depth 步内无解”，超出容量时淘汰最久未用的一项。"""
+        table = self.table
+        known = table.get(key)
+        if known is not None:
+            if known < depth:
+                table[key] = depth
+            table.move_to_end(key)
+            return
+        table[key] = depth
+        if len(table) > self.table_size:
+            table.popitem(last=False)
+
+    def _room_after_eating(self, target: int) -> int:
+        """蛇头进入 target 吃到食物后（蛇尾不动）的安全余量，棋盘填满时返回格子总数。"""
+        if self._free == 1:
+            return self._cells
+        self._occupied[target] = 1
+        self._body.append(target)
+        room = self._room()
+        self._body.pop()
+        self._occupied[target] = 0
+        return room
+
+    def _room(self) -> int:
+        """安全余量：蛇头挨着与蛇尾连通的空闲区域时返回该区域的格子数，否则返回 0。
+
+        只挨着蛇尾本身不算：引擎先检测碰撞再移走蛇尾，蛇头不能一步踩进当前的蛇尾。
+        """
+        body = self._body
+        occupied = self._occupied
+        neighbors = self._neighbors
+        mark = self._mark
+        self._stamp += 1
+        if self._stamp > 255:
+            mark[:] = self._zero_marks
+            self._stamp = 1
+        stamp = self._stamp
+        queue = self._queue
+        tail = body[0]
+        mark[tail] = stamp
+        queue[0] = tail
+        head_index = 0
+        end = 1
+        while head_index < end:
+            current = queue[head_index]
+            head_index += 1
+            for n in neighbors[current]:
+                if mark[n] != stamp and not occupied[n]:
+                    mark[n] = stamp
+                    queue[end] = n
+                    end += 1
+        for n in neighbors[body[-1]]:
+            if mark[n] == stamp and not occupied[n]:
+                return end - 1
+        return 0
+
+    def _stall_move(self) -> int:
+        """没有方案时选一个不吃食物、走完后仍然安全的方向：余量大的优先，其次靠近食物。
+
+        Returns:
+            方向序号，没有安全方向时返回 -1
+        """
+        head = self._body[-1]
+        best = -1
+        best_key = (0, 0)
+        for d, table in enumerate(self._tables):
+            target = table[head]
+            if target < 0 or self._occupied[target] or target == self._food:
+                continue
+            tail = self._push(d, target)
+            key = (self._room(), -self._distance[target])
+            self._pop(tail)
+            if key[0] and (best < 0 or key > best_key):
+                best = d
+                best_key = key
+        return best
+
+    def stats(self) -> Dict[str, float]:
+        """搜索统计：节点扩展速度与置换表命中率。
+
+        Returns:
+            包含 searches、solved、nodes、nodes_per_sec、lookups、hit_rate、table_entries、
+            max_search_ms、max_search_nodes、giveups 的字典
+        """
+        return {
+            "searches": self.searches,
+            "solved": self.solved,
+            "nodes": self.nodes,
+            "nodes_per_sec": self.nodes / self.search_time if self.search_time else 0.0,
+            "lookups": self.lookups,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "table_entries": len(self.table),
+            "max_search_ms": self.max_search_ms,
+            "max_search_nodes": self.max_search_nodes,
+            "giveups": self.giveups,
+        }
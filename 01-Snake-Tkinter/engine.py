@@ -0,0 +1,612 @@
+# -*- coding: utf-8 -*-
+"""贪吃蛇核心逻辑 - 与 Tkinter 无关的无界面游戏引擎。
+
+SnakeGame 在此基础上负责绘制与键盘输入；观战服务器等无界面场景可以直接驱动引擎。
+
+tick 路径（step + get_ai_direction）只使用构造时预先分配的表和缓冲区：坐标元组、
+相邻格子表和整数下标都提前创建，占据状态用 bytearray 维护，BFS 复用同一组队列和访问标记，
+稳态下每个 tick 不产生净内存分配。残局求解器（endgame.EndgameSolver）启用后不在此保证之内，
+它的分配随置换表容量有界，见 endgame 模块说明。
+
+棋盘由关卡（level.Level）描述，默认为空矩形；墙壁、传送门直接编进移动表。
+加载关卡时附带静态距离场，AI 与 bfs 先用 O(1) 的距离查询尝试直接得出结果，失败再退回 BFS。
+"""
+
+import random
+import time
+from collections import deque
+from typing import Optional, Tuple, List, Set, Generator, Any, Deque, Dict
+
+from endgame import ENDGAME_FREE_THRESHOLD, EndgameSolver
+from level import DistanceField, Level, UNREACHABLE
+from region import RegionTracker
+
+# 方向常量
+DIRECTION_UP = "Up"
+DIRECTION_DOWN = "Down"
+DIRECTION_LEFT = "Left"
+DIRECTION_RIGHT = "Right"
+
+OPPOSITE_DIRECTION = {
+    DIRECTION_UP: DIRECTION_DOWN,
+    DIRECTION_DOWN: DIRECTION_UP,
+    DIRECTION_LEFT: DIRECTION_RIGHT,
+    DIRECTION_RIGHT: DIRECTION_LEFT,
+}
+
+# 方向与坐标增量，顺序即 AI 选择候选方向的顺序
+DIRECTION_DELTAS = (
+    (DIRECTION_UP, 0, -1),
+    (DIRECTION_DOWN, 0, 1),
+    (DIRECTION_LEFT, -1, 0),
+    (DIRECTION_RIGHT, 1, 0),
+)
+
+# BFS 访问标记的最大轮次（bytearray 单字节），用完后整体清零
+_MAX_STAMP = 255
+
+# 输入队列容量：一个 tick 内最多缓存的转向次数
+INPUT_QUEUE_SIZE = 3
+
+# 保留最近多少次输入延迟样本
+LATENCY_SAMPLE_SIZE = 120
+
+
+class SnakeEngine:
+    """贪吃蛇无界面引擎，包含蛇的移动、食物生成和 AI 寻路。
+
+    监听器（listener）可以订阅引擎事件，需实现以下方法：
+        on_reset(engine): 新游戏开始（蛇和食物已就位）
+        on_step(engine, new_head, removed_tail): 每个 tick 结束；removed_tail 为
+            本 tick 移出的蛇尾，吃到食物时为 None
+        on_game_over(engine): 游戏结束
+
+    Attributes:
+        cols: 棋盘列数
+        rows: 棋盘行数
+        auto_play: 是否启用 AI 自动玩模式
+        level: 关卡地图
+        distances: 关卡的静态距离场；未指定关卡、关卡过大或距离表仍在后台构建时为 None
+        endgame: 残局求解器，未启用时为 None
+    """
+
+    def __init__(self, cols: int, rows: int, auto_play: bool = False,
+                 rng: Optional[random.Random] = None, level: Optional[Level] = None,
+                 distance_cache_dir: Optional[str] = None,
+                 endgame_threshold: Optional[int] = ENDGAME_FREE_THRESHOLD):
+        """初始化引擎。
+
+        Args:
+            cols: 棋盘列数
+            rows: 棋盘行数
+            auto_play: 是否启用 AI 模式
+            rng: 随机数生成器（可选，便于复现）
+            level: 关卡地图（可选，默认为空矩形棋盘）
+            distance_cache_dir: 距离场缓存目录（可选）
+            endgame_threshold: 空闲格子数不超过该值时 AI 改用残局精确搜索，None 表示不启用
+
+        Raises:
+            ValueError: 关卡尺寸与棋盘尺寸不一致
+        """
+        if level is not None and (level.cols, level.rows) != (cols, rows):
+            raise ValueError(f"关卡尺寸 {level.cols}x{level.rows} 与棋盘 {cols}x{rows} 不一致")
+        self.cols = cols
+        self.rows = rows
+        self.auto_play = auto_play
+        self.level = level if level is not None else Level.empty(cols, rows)
+        self.rng = rng if rng is not None else random.Random()
+
+        self.score = 0
+        self.direction = DIRECTION_RIGHT
+        self.pending_direction = DIRECTION_RIGHT
+        self.snake: List[Tuple[int, int]] = []
+        self.food: Optional[Tuple[int, int]] = None
+        self.game_over = False
+        self.tick = 0
+
+        # 输入队列：(方向, perf_counter 时间戳)，每个 tick 消费一项
+        self.input_queue: Deque[Tuple[str, float]] = deque()
+        self.input_latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLE_SIZE)
+        self._unrendered_input_time: Optional[float] = None
+
+        self._build_tables()
+
+        # 空闲区域追踪器，随蛇头占据、蛇尾释放增量更新（连通关系与移动表一致）
+        self.regions = RegionTracker(cols, rows, neighbors=self._neighbor_table)
+        self._region_snake: Optional[List[Tuple[int, int]]] = None
+
+        self.distances: Optional[DistanceField] = None
+        if level is not None:
+            self.distances = DistanceField.load_or_build(level, self._neighbor_table, distance_cache_dir)
+
+        self.endgame: Optional[EndgameSolver] = None
+        if endgame_threshold is not None:
+            self.endgame = EndgameSolver(endgame_threshold)
+
+        self.listeners: List[Any] = []
+
+    def _build_tables(self) -> None:
+        """预先生成 tick 路径用到的查找表和缓冲区。"""
+        cols, rows = self.cols, self.rows
+        cells = cols * rows
+        ids = list(range(cells))
+        self._cells: List[Tuple[int, int]] = [(i % cols, i // cols) for i in ids]
+        # 每个方向一张表：格子下标 -> 移动后的格子下标，出界、撞墙为 -1，传送门已展开
+        self._move_tables: Tuple[Tuple[str, List[int]], ...] = tuple(
+            (d, table) for (d, _, _), table in zip(DIRECTION_DELTAS, self.level.move_tables())
+        )
+        self._move_table: Dict[str, List[int]] = dict(self._move_tables)
+        self._neighbor_table: List[Tuple[int, ...]] = [
+            tuple(table[i] for _, table in self._move_tables if table[i] >= 0) for i in ids
+        ]
+        # 墙壁和传送门始终视为占据：碰撞检测和放置食物无需区分
+        blocked = bytearray(cells)
+        for x, y in self.level.blocked_cells():
+            blocked[y * cols + x] = 1
+        self._blocked_cells = bytes(blocked)
+        self._occupied = bytearray(blocked)
+        self._zero_cells = bytes(cells)
+        self._bfs_queue: List[int] = [0] * cells
+        self._bfs_parent: List[int] = [0] * cells
+        self._bfs_mark = bytearray(cells)
+        self._bfs_stamp = 0
+        self._candidate_dirs: List[str] = [DIRECTION_RIGHT] * 4
+        self._candidate_cells: List[int] = [0] * 4
+
+    def add_listener(self, listener: Any) -> None:
+        """注册引擎事件监听器。
+
+        Args:
+            listener: 实现 on_reset/on_step/on_game_over 的对象
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Any) -> None:
+        """注销引擎事件监听器。
+
+        Args:
+            listener: 之前注册的监听器
+        """
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def reset(self) -> None:
+        """重置游戏状态，开始新游戏。"""
+        self.score = 0
+        self.direction = DIRECTION_RIGHT
+        self.pending_direction = DIRECTION_RIGHT
+        self.input_queue.clear()
+        self._unrendered_input_time = None
+        self.game_over = False
+        self.tick = 0
+
+        self.snake = self.level.start_cells()
+        self._sync_occupancy()
+
+        self.place_food()
+        for listener in self.listeners:
+            listener.on_reset(self)
+
+    def change_direction(self, new_direction: str, timestamp: Optional[float] = None) -> None:
+        """把转向输入放入输入队列，每个 tick 消费一项。
+
+        Args:
+            new_direction: 新方向（Up/Down/Left/Right）
+            timestamp: 输入时间（perf_counter），默认为当前时间
+
+        Note:
+            相对队列中最后一个方向（队列为空时为当前方向）禁止 180 度转向，
+            重复方向和队列已满时的输入会被忽略。
+        """
+        last = self.input_queue[-1][0] if self.input_queue else self.direction
+        if new_direction == last or OPPOSITE_DIRECTION.get(new_direction) == last:
+            return
+        if len(self.input_queue) >= INPUT_QUEUE_SIZE:
+            return
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        self.input_queue.append((new_direction, timestamp))
+        if len(self.input_queue) == 1:
+            self.pending_direction = new_direction
+
+    def mark_rendered(self, now: Optional[float] = None) -> None:
+        """画面刷新后调用，记录本 tick 消费的输入从按键到显示的延迟。
+
+        Args:
+            now: 刷新完成时间（perf_counter），默认为当前时间
+        """
+        if self._unrendered_input_time is None:
+            return
+        if now is None:
+            now = time.perf_counter()
+        self.input_latencies.append(now - self._unrendered_input_time)
+        self._unrendered_input_time = None
+
+    def input_latency_stats(self) -> Dict[str, float]:
+        """返回最近输入延迟的统计（毫秒），用于对照实际延迟调整 speed。
+
+        Returns:
+            包含 count、last_ms、mean_ms、max_ms 的字典
+        """
+        samples = self.input_latencies
+        if not samples:
+            return {"count": 0, "last_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+        return {
+            "count": len(samples),
+            "last_ms": samples[-1] * 1000,
+            "mean_ms": sum(samples) / len(samples) * 1000,
+            "max_ms": max(samples) * 1000,
+        }
+
+    def step(self) -> None:
+        """推进一个 tick：移动蛇、处理吃食物与碰撞。"""
+        if self.game_over:
+            return
+
+        self._sync_occupancy()
+        if self.auto_play:
+            self.input_queue.clear()
+            self.pending_direction = self.get_ai_direction()
+        elif self.input_queue:
+            self.pending_direction, self._unrendered_input_time = self.input_queue.popleft()
+
+        self.direction = self.pending_direction
+        # 队列中的下一项成为下个 tick 的方向
+        if self.input_queue:
+            self.pending_direction = self.input_queue[0][0]
+
+        head_x, head_y = self.snake[-1]
+        target = self._move_table[self.direction][head_y * self.cols + head_x]
+        if target < 0:
+            self.end_game()
+            return
+
+        new_head = self._cells[target]
+        head_x, head_y = new_head
+
+        if self._is_occupied(head_x, head_y):
+            self.end_game()
+            return
+
+        self.snake.append(new_head)
+        self._occupy_cell(head_x, head_y)
+
+        removed_tail: Optional[Tuple[int, int]] = None
+        if new_head == self.food:
+            self.score += 1
+            self.place_food()
+        else:
+            removed_tail = self.snake.pop(0)
+            self._release_cell(*removed_tail)
+
+        self.tick += 1
+        for listener in self.listeners:
+            listener.on_step(self, new_head, removed_tail)
+
+    def _sync_occupancy(self) -> None:
+        """蛇身被外部整体替换时重建占据信息。"""
+        if self._region_snake is not self.snake or self.regions.occupied_count != len(self.snake):
+            self._rebuild_occupancy()
+            self._region_snake = self.snake
+
+    def _rebuild_occupancy(self) -> None:
+        """按当前蛇身重建占据信息，子类可扩展以维护自己的棋盘表示。"""
+        occupied = self._occupied
+        occupied[:] = self._blocked_cells
+        for x, y in self.snake:
+            occupied[y * self.cols + x] = 1
+        self.regions.reset(self.snake)
+
+    def _occupy_cell(self, x: int, y: int) -> None:
+        """记录格子被蛇头占据。"""
+        index = y * self.cols + x
+        self._occupied[index] = 1
+        self.regions.occupy_at(index)
+
+    def _release_cell(self, x: int, y: int) -> None:
+        """记录格子被蛇尾释放。"""
+        index = y * self.cols + x
+        self._occupied[index] = 0
+        self.regions.release_at(index)
+
+    def _is_occupied(self, x: int, y: int) -> bool:
+        """检查格子是否被蛇身占据。"""
+        return bool(self._occupied[y * self.cols + x])
+
+    def _next_bfs_stamp(self) -> int:
+        """返回新一轮 BFS 的访问标记，用完时清零标记数组。"""
+        stamp = self._bfs_stamp + 1
+        if stamp > _MAX_STAMP:
+            self._bfs_mark[:] = self._zero_cells
+            stamp = 1
+        self._bfs_stamp = stamp
+        return stamp
+
+    def is_inside(self, x: int, y: int) -> bool:
+        """检查坐标是否在游戏边界内。
+
+        Args:
+            x: X 坐标
+            y: Y 坐标
+
+        Returns:
+            如果坐标在边界内返回 True，否则 False
+        """
+        return 0 <= x < self.cols and 0 <= y < self.rows
+
+    def neighbors(self, x: int, y: int) -> Generator[Tuple[int, int], None, None]:
+        """获取相邻的四个方向坐标。
+
+        Args:
+            x: X 坐标
+            y: Y 坐标
+
+        Yields:
+            相邻坐标的元组
+        """
+        for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+            nx = x + dx
+            ny = y + dy
+            if self.is_inside(nx, ny):
+                yield nx, ny
+
+    def bfs(self, start: Tuple[int, int], goal: Tuple[int, int],
+            blocked: Set[Tuple[int, int]]) -> Optional[List[Tuple[int, int]]]:
+        """使用 BFS 寻找从起点到终点的路径。
+
+        Args:
+            start: 起点坐标
+            goal: 终点坐标
+            blocked: 障碍物坐标集合
+
+        Returns:
+            路径坐标列表，如果找不到路径返回 None
+        """
+        if not (self.is_inside(*start) and self.is_inside(*goal)):
+            return None
+        cols = self.cols
+        cells = self._cells
+        if self.distances is not None:
+            # 静态距离不可达则必然不可达；沿距离梯度走通则已是最短路
+            steps = self._descend(start[1] * cols + start[0], goal[1] * cols + goal[0], blocked)
+            if steps == -2:
+                return None
+            if steps >= 0:
+                return [cells[self._bfs_queue[k]] for k in range(steps + 1)]
+        neighbors = self._neighbor_table
+        queue = self._bfs_queue
+        parent = self._bfs_parent
+        mark = self._bfs_mark
+        stamp = self._next_bfs_stamp()
+        start_index = start[1] * cols + start[0]
+        goal_index = goal[1] * cols + goal[0]
+        mark[start_index] = stamp
+        queue[0] = start_index
+        head = 0
+        tail = 1
+        while head < tail:
+            current = queue[head]
+            head += 1
+            if current == goal_index:
+                path = []
+                while current != start_index:
+                    path.append(cells[current])
+                    current = parent[current]
+                path.append(start)
+                path.reverse()
+                return path
+            for n in neighbors[current]:
+                if mark[n] == stamp or cells[n] in blocked:
+                    continue
+                mark[n] = stamp
+                parent[n] = current
+                queue[tail] = n
+                tail += 1
+        return None
+
+    def get_ai_direction(self) -> str:
+        """使用 BFS 算法获取 AI 的移动方向，并优先选择空闲区域足够大的方向。
+
+        空闲格子不多时先交给残局求解器，求解器给不出安全方向时再用贪心策略。
+
+        Returns:
+            最佳移动方向
+        """
+        self._sync_occupancy()
+        if self.endgame is not None:
+            direction = self.endgame.choose(self)
+            if direction is not None:
+                return direction
+        head_x, head_y = self.snake[-1]
+        head = head_y * self.cols + head_x
+        occupied = self._occupied
+        dirs = self._candidate_dirs
+        cells = self._candidate_cells
+        check_reverse = len(self.snake) > 1
+        count = 0
+
+        for d, table in self._move_tables:
+            # 检查是否是相反方向
+            if check_reverse and OPPOSITE_DIRECTION[d] == self.direction:
+                continue
+            target = table[head]
+            if target < 0 or occupied[target]:
+                continue
+            dirs[count] = d
+            cells[count] = target
+            count += 1
+
+        if count == 0:
+            return self.direction
+
+        # 按落脚后可到达的空闲区域大小筛选，避免钻进容不下蛇身的死胡同
+        regions = self.regions
+        best_room = -1
+        fallback = dirs[0]
+        k = 0
+        while k < count:
+            room = regions.region_size_at(cells[k])
+            if room > best_room:
+                best_room = room
+                fallback = dirs[k]
+            k += 1
+        need = len(self.snake)
+        kept = 0
+        k = 0
+        while k < count:
+            room = regions.region_size_at(cells[k])
+            if room >= need if best_room >= need else room == best_room:
+                dirs[kept] = dirs[k]
+                cells[kept] = cells[k]
+                kept += 1
+            k += 1
+
+        if self.food is None:
+            return fallback
+
+        best = self._nearest_candidate(kept)
+        if best >= 0:
+            return dirs[best]
+
+        return fallback
+
+    def _nearest_candidate(self, count: int) -> int:
+        """从食物出发做一次分层 BFS，找出离食物最近的候选格子。
+
+        与从每个候选格子分别搜索到食物等价（网格距离对称），但只需一次搜索。
+        距离相同时取候选顺序靠前者。
+
+        Args:
+            count: 候选格子数（存放在 _candidate_cells 中）
+
+        Returns:
+            候选格子序号，食物不可达时返回 -1
+        """
+        food_x, food_y = self.food
+        food = food_y * self.cols + food_x
+        cells = self._candidate_cells
+        occupied = self._occupied
+        if self.distances is not None:
+            best = self._static_nearest_candidate(count, food)
+            if best != -2:
+                return best
+        neighbors = self._neighbor_table
+        queue = self._bfs_queue
+        mark = self._bfs_mark
+        stamp = self._next_bfs_stamp()
+        mark[food] = stamp
+        queue[0] = food
+        head = 0
+        tail = 1
+        layer_end = 1
+        best = -1
+        while head < tail:
+            if head == layer_end:
+                if best >= 0:
+                    # 当前层已处理完，更远的候选不可能更优
+                    return best
+                layer_end = tail
+            current = queue[head]
+            head += 1
+            k = 0
+            while k < count:
+                if cells[k] == current and (best < 0 or k < best):
+                    best = k
+                k += 1
+            for n in neighbors[current]:
+                if mark[n] != stamp and not occupied[n]:
+                    mark[n] = stamp
+                    queue[tail] = n
+                    tail += 1
+        return best
+
+    def _static_nearest_candidate(self, count: int, food: int) -> int:
+        """用静态距离场找出离食物最近的候选格子，无需搜索。
+
+        静态距离（忽略蛇身）是真实距离的下界。取静态距离最小的候选中最靠前的一个，
+        若能沿距离梯度避开蛇身走到食物，它的真实距离等于下界，结果与 BFS 相同。
+
+        Args:
+            count: 候选格子数（存放在 _candidate_cells 中）
+            food: 食物格子下标
+
+        Returns:
+            候选格子序号；所有候选静态不可达时返回 -1；无法确定时返回 -2
+        """
+        table = self.distances.table
+        base = food * self.distances.cells
+        cells = self._candidate_cells
+        best = -1
+        best_distance = UNREACHABLE
+        k = 0
+        while k < count:
+            distance = table[base + cells[k]]
+            if distance < best_distance:
+                best_distance = distance
+                best = k
+            k += 1
+        if best < 0:
+            return -1
+        if self._descend(cells[best], food) >= 0:
+            return best
+        return -2
+
+    def _descend(self, start: int, goal: int, blocked: Optional[Set[Tuple[int, int]]] = None) -> int:
+        """沿静态距离逐步递减的方向从起点走向终点，途经格子依次存入 _bfs_queue。
+
+        每一步取第一个距离减一且未被挡住的相邻格子，不回溯；走通时得到的是一条最短路。
+
+        Args:
+            start: 起点下标
+            goal: 终点下标
+            blocked: 障碍物坐标集合，默认为当前占据表
+
+        Returns:
+            路径步数；被挡住时返回 -1；静态不可达时返回 -2
+        """
+        table = self.distances.table
+        base = goal * self.distances.cells
+        distance = table[base + start]
+        if distance == UNREACHABLE:
+            return -2
+        neighbors = self._neighbor_table
+        occupied = self._occupied
+        cells = self._cells
+        queue = self._bfs_queue
+        queue[0] = start
+        current = start
+        steps = distance
+        while distance:
+            distance -= 1
+            for n in neighbors[current]:
+                if table[base + n] != distance:
+                    continue
+                if occupied[n] if blocked is None else cells[n] in blocked:
+                    continue
+                current = n
+                break
+            else:
+                return -1
+            queue[steps - distance] = current
+        return steps
+
+    def place_food(self) -> None:
+        """在空白位置放置食物，按占据表逐个跳过，不构造空格子列表。"""
+        self._sync_occupancy()
+        occupied = self._occupied
+        free = len(occupied) - occupied.count(1)
+        if free == 0:
+            self.end_game()
+            return
+        k = self.rng.randrange(free)
+        index = occupied.find(0)
+        while k:
+            index = occupied.find(0, index + 1)
+            k -= 1
+        self.food = self._cells[index]
+
+    def end_game(self) -> None:
+        """结束游戏。"""
+        self.game_over = True
+        for listener in self.listeners:
+            listener.on_game_over(self)
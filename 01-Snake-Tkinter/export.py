@@ -0,0 +1,571 @@
+# -*- coding: utf-8 -*-
+"""无界面帧导出 - 把对局画进内存中的 RGB 缓冲区，再写成 PNG 序列或 GIF 动画。
+
+FrameRenderer 实现引擎监听器协议：每个 tick 只重画变化的格子（蛇尾、旧蛇头、新蛇头、食物），
+每个格子是 cell_size 次切片赋值。除 RGB 缓冲区外同时维护一份调色板下标缓冲区，供 GIF 使用。
+回放（例如观战协议的 SpectatorState）可以用 draw_state 按整帧状态绘制，同样只改动有差异的格子。
+
+PNG 与 GIF 编码都只用标准库：PNG 是逐行加过滤字节后 zlib 压缩（默认写调色板 PNG）；GIF 用 LZW 编码，
+每帧只编码变化格子的外接矩形，画面没有变化时延长上一帧的显示时间。整个过程不需要 Tk 和显示器。
+
+用法：
+    python export.py gif run.gif [--ticks 500 --cols 30 --rows 20 --cell-size 8]
+    python export.py png frames/ [--ticks 500 --level levels/arena.txt]
+"""
+
+import argparse
+import os
+import random
+import re
+import struct
+import zlib
+from typing import BinaryIO, List, Optional, Sequence, Tuple, Union
+
+from colors import (
+    COLOR_BACKGROUND,
+    COLOR_SNAKE_BODY,
+    COLOR_SNAKE_HEAD,
+    COLOR_FOOD,
+    COLOR_WALL,
+    COLOR_PORTAL,
+    to_rgb,
+)
+from engine import SnakeEngine
+from level import Level
+
+# 调色板下标
+PALETTE_BACKGROUND = 0
+PALETTE_BODY = 1
+PALETTE_HEAD = 2
+PALETTE_FOOD = 3
+PALETTE_WALL = 4
+PALETTE_PORTAL = 5
+
+# 调色板颜色，顺序与上面的下标一致
+PALETTE_COLORS = (COLOR_BACKGROUND, COLOR_SNAKE_BODY, COLOR_SNAKE_HEAD,
+                  COLOR_FOOD, COLOR_WALL, COLOR_PORTAL)
+
+# 导出默认参数
+DEFAULT_EXPORT_CELL_SIZE = 8
+DEFAULT_GIF_DELAY_CS = 10
+DEFAULT_PNG_COMPRESS_LEVEL = 1
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# GIF LZW 码字最多 12 位
+_GIF_MAX_CODES = 4096
+
+# 同一字节的连续段
+_RUN_PATTERN = re.compile(rb"(.)\1*", re.DOTALL)
+
+
+def export_palette() -> List[Tuple[int, int, int]]:
+    """导出使用的调色板 RGB，下标即 PALETTE_* 常量。"""
+    return [to_rgb(color) for color in PALETTE_COLORS]
+
+
+class FrameRenderer:
+    """把引擎状态画进 RGB 缓冲区的无界面渲染器。
+
+    Attributes:
+        cols: 棋盘列数
+        rows: 棋盘行数
+        cell_size: 每个格子的像素边长
+        width: 图像宽度（像素）
+        height: 图像高度（像素）
+        rgb: RGB 缓冲区，每像素 3 字节，按行存储
+        indexed: 调色板下标缓冲区，每像素 1 字节
+        palette: 调色板 RGB 列表
+    """
+
+    def __init__(self, cols: int, rows: int, cell_size: int = DEFAULT_EXPORT_CELL_SIZE,
+                 level: Optional[Level] = None):
+        """初始化渲染器并画出背景与关卡。
+
+        Args:
+            cols: 棋盘列数
+            rows: 棋盘行数
+            cell_size: 每个格子的像素边长
+            level: 关卡地图（可选），墙壁和传送门画在背景上
+        """
+        self.cols = cols
+        self.rows = rows
+        self.cell_size = cell_size
+        self.width = cols * cell_size
+        self.height = rows * cell_size
+        self.palette = export_palette()
+
+        background = self.palette[PALETTE_BACKGROUND]
+        self.rgb = bytearray(bytes(background) * (self.width * self.height))
+        self.indexed = bytearray(self.width * self.height)
+        # 每种颜色一个格子宽度的像素行，绘制时整段切片赋值
+        self._rgb_rows = [bytes(color) * cell_size for color in self.palette]
+        self._index_rows = [bytes([index]) * cell_size for index in range(len(self.palette))]
+        self._cells = bytearray(cols * rows)
+        self._head: Optional[int] = None
+        self._food: Optional[int] = None
+        # 变化区域的外接矩形（格子坐标 [x0, y0, x1, y1]）
+        self._dirty: Optional[List[int]] = None
+
+        # 静态背景：墙壁和传送门，格子空出时恢复成这里的颜色
+        self._static = bytearray(cols * rows)
+        if level is not None:
+            for x, y in level.walls:
+                self._static[y * cols + x] = PALETTE_WALL
+            for x, y in level.portals:
+                self._static[y * cols + x] = PALETTE_PORTAL
+        for index, color in enumerate(self._static):
+            if color:
+                self.paint(index, color)
+
+    def paint(self, index: int, color: int) -> None:
+        """把一个格子画成指定颜色，颜色未变时不做任何事。
+
+        Args:
+            index: 格子下标 y * cols + x
+            color: 调色板下标
+        """
+        if self._cells[index] == color:
+            return
+        self._cells[index] = color
+        cell_size = self.cell_size
+        width = self.width
+        x = index % self.cols
+        y = index // self.cols
+        rgb_row = self._rgb_rows[color]
+        index_row = self._index_rows[color]
+        offset = y * cell_size * width + x * cell_size
+        for _ in range(cell_size):
+            self.rgb[offset * 3:(offset + cell_size) * 3] = rgb_row
+            self.indexed[offset:offset + cell_size] = index_row
+            offset += width
+
+        dirty = self._dirty
+        if dirty is None:
+            self._dirty = [x, y, x, y]
+        else:
+            if x < dirty[0]:
+                dirty[0] = x
+            if y < dirty[1]:
+                dirty[1] = y
+            if x > dirty[2]:
+                dirty[2] = x
+            if y > dirty[3]:
+                dirty[3] = y
+
+    def take_dirty(self) -> Optional[Tuple[int, int, int, int]]:
+        """取出并清空自上次调用以来变化区域的外接矩形。
+
+        Returns:
+            像素矩形 (left, top, width, height)，没有变化时返回 None
+        """
+        dirty = self._dirty
+        self._dirty = None
+        if dirty is None:
+            return None
+        cell_size = self.cell_size
+        return (dirty[0] * cell_size, dirty[1] * cell_size,
+                (dirty[2] - dirty[0] + 1) * cell_size, (dirty[3] - dirty[1] + 1) * cell_size)
+
+    def draw_state(self, snake: Sequence[Tuple[int, int]], food: Optional[Tuple[int, int]]) -> None:
+        """按整帧状态绘制（新游戏开始、回放），只重画与当前画面不同的格子。
+
+        Args:
+            snake: 蛇身坐标（尾 → 头）
+            food: 食物坐标，没有食物时为 None
+        """
+        cols = self.cols
+        target = bytearray(self._static)
+        for x, y in snake:
+            target[y * cols + x] = PALETTE_BODY
+        self._head = None
+        if snake:
+            head_x, head_y = snake[-1]
+            self._head = head_y * cols + head_x
+            target[self._head] = PALETTE_HEAD
+        self._food = None
+        if food is not None:
+            self._food = food[1] * cols + food[0]
+            target[self._food] = PALETTE_FOOD
+        cells = self._cells
+        for index in range(len(target)):
+            if cells[index] != target[index]:
+                self.paint(index, target[index])
+
+    def on_reset(self, engine: SnakeEngine) -> None:
+        """新游戏开始时整帧重画。"""
+        self.draw_state(engine.snake, engine.food)
+
+    def on_step(self, engine: SnakeEngine, new_head: Tuple[int, int],
+                removed_tail: Optional[Tuple[int, int]]) -> None:
+        """每个 tick 只重画蛇尾、旧蛇头、新蛇头和食物。"""
+        cols = self.cols
+        if removed_tail is not None:
+            tail = removed_tail[1] * cols + removed_tail[0]
+            self.paint(tail, self._static[tail])
+        if self._head is not None:
+            self.paint(self._head, PALETTE_BODY)
+        head = new_head[1] * cols + new_head[0]
+        self.paint(head, PALETTE_HEAD)
+        self._head = head
+        food = engine.food
+        food_index = None if food is None else food[1] * cols + food[0]
+        if food_index != self._food:
+            # 食物被吃掉时旧位置已是蛇头，只有食物被移走时才需要恢复
+            if self._food is not None and self._food != head and self._cells[self._food] == PALETTE_FOOD:
+                self.paint(self._food, self._static[self._food])
+            self._food = food_index
+            if food_index is not None:
+                self.paint(food_index, PALETTE_FOOD)
+
+    def on_game_over(self, engine: SnakeEngine) -> None:
+        """游戏结束时画面不变。"""
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    """编码一个 PNG 数据块：长度、类型、数据、CRC。"""
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _png_image_data(row_bytes: int, height: int, pixels: Union[bytes, bytearray]) -> bytes:
+    """逐行加过滤字节，得到 IDAT 压缩前的数据。
+
+    与上一行相同的行用过滤类型 2（Up），过滤结果全为 0，缓冲区本来就是 0，只需写过滤字节；
+    其余行用过滤类型 0（不过滤）整段拷贝。格子内的像素行都相同，大部分行属于前者。
+    """
+    raw = bytearray((row_bytes + 1) * height)
+    previous = None
+    for y in range(height):
+        start = y * (row_bytes + 1)
+        row = pixels[y * row_bytes:(y + 1) * row_bytes]
+        if row == previous:
+            raw[start] = 2
+        else:
+            raw[start + 1:start + 1 + row_bytes] = row
+        previous = row
+    return bytes(raw)
+
+
+def encode_png(width: int, height: int, rgb: Union[bytes, bytearray],
+               compress_level: int = DEFAULT_PNG_COMPRESS_LEVEL) -> bytes:
+    """把 RGB 缓冲区编码为 8 位真彩色 PNG。
+
+    Args:
+        width: 图像宽度
+        height: 图像高度
+        rgb: RGB 数据，长度为 width * height * 3
+        compress_level: zlib 压缩级别（0-9）
+
+    Returns:
+        PNG 文件内容
+    """
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    data = _png_image_data(width * 3, height, rgb)
+    return b"".join((
+        PNG_SIGNATURE,
+        _png_chunk(b"IHDR", header),
+        _png_chunk(b"IDAT", zlib.compress(data, compress_level)),
+        _png_chunk(b"IEND", b""),
+    ))
+
+
+def encode_indexed_png(width: int, height: int, indices: Union[bytes, bytearray],
+                       palette: Sequence[Tuple[int, int, int]],
+                       compress_level: int = DEFAULT_PNG_COMPRESS_LEVEL) -> bytes:
+    """把调色板下标缓冲区编码为 8 位调色板 PNG，待压缩数据只有真彩色的三分之一。
+
+    Args:
+        width: 图像宽度
+        height: 图像高度
+        indices: 调色板下标，长度为 width * height
+        palette: 调色板 RGB 列表（最多 256 色）
+        compress_level: zlib 压缩级别（0-9）
+
+    Returns:
+        PNG 文件内容
+    """
+    header = struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)
+    data = _png_image_data(width, height, indices)
+    return b"".join((
+        PNG_SIGNATURE,
+        _png_chunk(b"IHDR", header),
+        _png_chunk(b"PLTE", b"".join(bytes(color) for color in palette)),
+        _png_chunk(b"IDAT", zlib.compress(data, compress_level)),
+        _png_chunk(b"IEND", b""),
+    ))
+
+
+def lzw_encode(data: Union[bytes, bytearray], min_code_size: int) -> bytes:
+    """GIF 变长码 LZW 编码，按同色连续段（run）切分而不是逐像素匹配。
+
+    解码端只按“上一个码字的串 + 当前码字串的首字节”追加码表，并不要求编码端做最长匹配。
+    这里编码端只输出纯色串 c^k 的码字：一段长为 L 的同色像素取已知的最长 c^k 输出，
+    循环直到用完，码表增长与解码端完全一致。每帧的循环次数与色段数成正比，而不是像素数。
+
+    Args:
+        data: 调色板下标序列
+        min_code_size: 最小码长（调色板位数，至少为 2）
+
+    Returns:
+        编码后的字节流（未分成数据子块）
+    """
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+    out = bytearray()
+    bit_buffer = 0
+    bit_count = 0
+    code_size = min_code_size + 1
+    next_code = end_code + 1
+    # runs[c][k] 为串 c^k 的码字，runs[c][0] 不使用
+    runs = [[0, c] for c in range(clear_code)]
+    # 上一个输出的码字对应的串 prev_value^prev_length，它在码表中追加的新项编号为 pending
+    pending = -1
+    prev_value = -1
+    prev_length = 0
+
+    bit_buffer |= clear_code << bit_count
+    bit_count += code_size
+
+    for match in _RUN_PATTERN.finditer(data):
+        value = data[match.start()]
+        remaining = match.end() - match.start()
+        while remaining:
+            codes = runs[value]
+            length = len(codes) - 1
+            if length > remaining:
+                length = remaining
+            bit_buffer |= codes[length] << bit_count
+            bit_count += code_size
+            while bit_count >= 8:
+                out.append(bit_buffer & 0xFF)
+                bit_buffer >>= 8
+                bit_count -= 8
+            # 上一项追加的串是 prev_value^prev_length 加上本串首字节，同色时即为更长的纯色串
+            if pending >= 0 and prev_value == value and prev_length + 1 == len(codes):
+                codes.append(pending)
+            remaining -= length
+            if next_code < _GIF_MAX_CODES:
+                pending = next_code
+                prev_value = value
+                prev_length = length
+                next_code += 1
+                # 解码端的码表比编码端晚一项，码长在其下一个码字开始增长
+                if next_code > 1 << code_size and code_size < 12:
+                    code_size += 1
+            else:
+                bit_buffer |= clear_code << bit_count
+                bit_count += code_size
+                runs = [[0, c] for c in range(clear_code)]
+                code_size = min_code_size + 1
+                next_code = end_code + 1
+                pending = -1
+
+    bit_buffer |= end_code << bit_count
+    bit_count += code_size
+    while bit_count > 0:
+        out.append(bit_buffer & 0xFF)
+        bit_buffer >>= 8
+        bit_count -= 8
+    return bytes(out)
+
+
+def _sub_blocks(data: bytes) -> bytes:
+    """把数据切成 GIF 数据子块（每块最多 255 字节），以长度为 0 的块结尾。"""
+    parts = []
+    for start in range(0, len(data), 255):
+        block = data[start:start + 255]
+        parts.append(bytes([len(block)]))
+        parts.append(block)
+    parts.append(b"\x00")
+    return b"".join(parts)
+
+
+class GifWriter:
+    """GIF 动画写入器，每帧只编码变化区域。
+
+    每帧在写入下一帧（或关闭）时才落盘，以便画面没有变化时把时间累加到上一帧的延迟上。
+    """
+
+    def __init__(self, target: Union[str, BinaryIO], width: int, height: int,
+                 palette: Sequence[Tuple[int, int, int]], delay_cs: int = DEFAULT_GIF_DELAY_CS,
+                 loop: int = 0):
+        """写入文件头、全局调色板和循环播放扩展。
+
+        Args:
+            target: 输出文件路径或二进制流
+            width: 图像宽度
+            height: 图像高度
+            palette: 调色板 RGB 列表（最多 256 色）
+            delay_cs: 每帧显示时间（百分之一秒）
+            loop: 循环次数，0 表示无限循环
+        """
+        self._owns_stream = isinstance(target, str)
+        self.stream: BinaryIO = open(target, "wb") if isinstance(target, str) else target
+        self.width = width
+        self.height = height
+        self.delay_cs = delay_cs
+        self.frame_count = 0
+        bits = 1
+        while (1 << bits) < len(palette):
+            bits += 1
+        self._min_code_size = max(bits, 2)
+        table = bytearray()
+        for color in palette:
+            table.extend(color)
+        table.extend(b"\x00" * (3 * (1 << bits) - len(table)))
+        self._pending: Optional[Tuple[bytes, int]] = None
+
+        self.stream.write(b"GIF89a")
+        self.stream.write(struct.pack("<HHBBB", width, height, 0x80 | (bits - 1) << 4 | (bits - 1), 0, 0))
+        self.stream.write(bytes(table))
+        self.stream.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+
+    def write(self, renderer: FrameRenderer) -> None:
+        """写入渲染器的当前画面，只编码自上一帧以来变化的区域。
+
+        Args:
+            renderer: 帧渲染器（与写入器尺寸相同）
+        """
+        rect = renderer.take_dirty()
+        if self.frame_count == 0:
+            rect = (0, 0, self.width, self.height)
+        self.frame_count += 1
+        if rect is None:
+            if self._pending is not None:
+                image, delay = self._pending
+                self._pending = (image, delay + self.delay_cs)
+            return
+        self._flush()
+        left, top, width, height = rect
+        pixels = renderer.indexed
+        if width == self.width:
+            region = bytes(pixels[top * width:(top + height) * width])
+        else:
+            region = b"".join(
+                pixels[(top + y) * self.width + left:(top + y) * self.width + left + width]
+                for y in range(height)
+            )
+        descriptor = b"\x2c" + struct.pack("<HHHHB", left, top, width, height, 0)
+        data = bytes([self._min_code_size]) + _sub_blocks(lzw_encode(region, self._min_code_size))
+        self._pending = (descriptor + data, self.delay_cs)
+
+    def _flush(self) -> None:
+        """写出等待中的一帧：图形控制扩展（延迟、保留上一帧画面）与图像数据。"""
+        if self._pending is None:
+            return
+        image, delay = self._pending
+        # 处置方式 1：保留画面，后续帧只覆盖变化区域
+        self.stream.write(b"\x21\xf9\x04" + struct.pack("<BHBB", 1 << 2, min(delay, 0xFFFF), 0, 0))
+        self.stream.write(image)
+        self._pending = None
+
+    def close(self) -> None:
+        """写出最后一帧和文件尾。"""
+        self._flush()
+        self.stream.write(b"\x3b")
+        if self._owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+class PngSequenceWriter:
+    """把每一帧写成一个 PNG 文件：<directory>/<prefix>_00000.png ……"""
+
+    def __init__(self, directory: str, prefix: str = "frame",
+                 compress_level: int = DEFAULT_PNG_COMPRESS_LEVEL, indexed: bool = True):
+        """创建输出目录。
+
+        Args:
+            directory: 输出目录
+            prefix: 文件名前缀
+            compress_level: zlib 压缩级别
+            indexed: 是否写调色板 PNG（更快更小，颜色相同），否则写 RGB 真彩色 PNG
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.compress_level = compress_level
+        self.indexed = indexed
+        self.frame_count = 0
+
+    def write(self, renderer: FrameRenderer) -> str:
+        """写入渲染器的当前画面。
+
+        Returns:
+            写入的文件路径
+        """
+        path = os.path.join(self.directory, f"{self.prefix}_{self.frame_count:05d}.png")
+        if self.indexed:
+            data = encode_indexed_png(renderer.width, renderer.height, renderer.indexed,
+                                      renderer.palette, self.compress_level)
+        else:
+            data = encode_png(renderer.width, renderer.height, renderer.rgb, self.compress_level)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.frame_count += 1
+        return path
+
+    def close(self) -> None:
+        """PNG 序列逐帧落盘，无需收尾。"""
+
+
+def export_game(engine: SnakeEngine, sink, ticks: int,
+                cell_size: int = DEFAULT_EXPORT_CELL_SIZE) -> int:
+    """运行一局并把每个 tick 的画面写入 sink，游戏结束或达到 tick 数时停止。
+
+    Args:
+        engine: 引擎（通常开启 AI 模式）
+        sink: 帧写入器（GifWriter / PngSequenceWriter，需与渲染器尺寸一致）
+        ticks: 最多运行的 tick 数
+        cell_size: 每个格子的像素边长
+
+    Returns:
+        写入的帧数
+    """
+    renderer = FrameRenderer(engine.cols, engine.rows, cell_size, level=engine.level)
+    engine.add_listener(renderer)
+    try:
+        engine.reset()
+        sink.write(renderer)
+        frames = 1
+        while frames <= ticks and not engine.game_over:
+            engine.step()
+            sink.write(renderer)
+            frames += 1
+    finally:
+        engine.remove_listener(renderer)
+    return frames
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """命令行入口：运行无界面 AI 对局并导出为 GIF 动画或 PNG 序列。"""
+    parser = argparse.ArgumentParser(description="贪吃蛇对局导出")
+    parser.add_argument("format", choices=["gif", "png"])
+    parser.add_argument("output", help="GIF 文件路径或 PNG 输出目录")
+    parser.add_argument("--cols", type=int, default=30)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--level", default=None, help="关卡文件路径")
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cell-size", type=int, default=DEFAULT_EXPORT_CELL_SIZE)
+    parser.add_argument("--delay-cs", type=int, default=DEFAULT_GIF_DELAY_CS)
+    args = parser.parse_args(argv)
+
+    level = Level.load(args.level) if args.level else None
+    cols, rows = (level.cols, level.rows) if level else (args.cols, args.rows)
+    engine = SnakeEngine(cols, rows, auto_play=True, rng=random.Random(args.seed), level=level)
+    if args.format == "gif":
+        sink = GifWriter(args.output, cols * args.cell_size, rows * args.cell_size,
+                         export_palette(), args.delay_cs)
+    else:
+        sink = PngSequenceWriter(args.output)
+    try:
+        frames = export_game(engine, sink, args.ticks, args.cell_size)
+    finally:
+        sink.close()
+    print(f"导出 {frames} 帧，得分：{engine.score}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+"""关卡地图 - 静态墙壁、传送门，以及按关卡哈希缓存到磁盘的距离场。
+
+关卡文件是等宽的文本网格：
+
+    #  墙壁
+    .  空地
+    S  蛇头起始位置（蛇身向左延伸两格，初始方向向右）
+    a-z 传送门，同一字母恰好出现两次，成对连通
+
+以 ; 开头的行是注释。传送门本身不能停留：蛇头进入一个传送门时，从另一个传送门沿原方向
+走出一格。
+
+墙壁和传送门不会变化，所以任意两格之间的静态最短距离（不考虑蛇身）可以预先计算。
+距离表按关卡哈希存为二进制文件，用 mmap 只读映射，第二次加载同一关卡时无需重新计算，
+查询是一次下标访问。格子较多的关卡首次加载时在后台线程中构建距离表，本局不使用距离场；
+超过距离表上限的关卡始终不使用距离场。
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+# 距离表中不可达的取值
+UNREACHABLE = 0xFFFF
+
+# 距离表最多支持的格子数（所有格子对，每对 2 字节）
+MAX_DISTANCE_CELLS = 4096
+
+# 缓存不存在时，格子数不超过该值的关卡在加载时直接构建距离表（约 0.4 秒），更大的转到后台构建
+MAX_SYNC_BUILD_CELLS = 1024
+
+# 距离缓存文件格式：魔数、版本、字节序、列数、行数
+DISTANCE_MAGIC = b"SNKD"
+DISTANCE_VERSION = 1
+_HEADER = struct.Struct("<4sHBxHH")
+
+# 默认缓存目录
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "snake-tkinter")
+
+# 正在后台构建的距离表：缓存路径 -> 构建线程
+_background_builds: Dict[str, threading.Thread] = {}
+_background_lock = threading.Lock()
+
+# 相邻格子的坐标增量，顺序与 engine.DIRECTION_DELTAS 一致（上、下、左、右）
+_DELTAS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+_WALL = "#"
+_FLOOR = "."
+_START = "S"
+
+
+class Level:
+    """关卡地图。
+
+    Attributes:
+        cols: 棋盘列数
+        rows: 棋盘行数
+        walls: 墙壁格子集合
+        portals: 传送门格子 -> 配对的传送门格子
+        start: 蛇头起始位置，None 表示棋盘中央
+    """
+
+    def __init__(self, cols: int, rows: int, walls: FrozenSet[Tuple[int, int]] = frozenset(),
+                 portals: Optional[Dict[Tuple[int, int], Tuple[int, int]]] = None,
+                 start: Optional[Tuple[int, int]] = None):
+        """创建关卡并检查起始位置可用。
+
+        Args:
+            cols: 棋盘列数
+            rows: 棋盘行数
+            walls: 墙壁格子集合
+            portals: 传送门配对（双向都要给出）
+            start: 蛇头起始位置（可选）
+
+        Raises:
+            ValueError: 传送门不成对，或起始的三格蛇身落在墙壁、传送门上（显式给出起始位置时
+                也不能超出棋盘）
+        """
+        self.cols = cols
+        self.rows = rows
+        self.walls = frozenset(walls)
+        self.portals = dict(portals or {})
+        self.start = start
+        for cell, other in self.portals.items():
+            if self.portals.get(other) != cell or other == cell:
+                raise ValueError(f"传送门 {cell} 没有正确配对")
+        for x, y in self.start_cells():
+            inside = 0 <= x < cols and 0 <= y < rows
+            if (start is not None and not inside) or self.is_blocked(x, y):
+                raise ValueError(f"起始位置 ({x}, {y}) 不可用")
+
+    @classmethod
+    def empty(cls, cols: int, rows: int) -> "Level":
+        """没有墙壁和传送门的矩形棋盘。"""
+        return cls(cols, rows)
+
+    @classmethod
+    def from_text(cls, text: str) -> "Level":
+        """解析关卡文本。
+
+        Args:
+            text: 关卡文本
+
+        Returns:
+            关卡对象
+
+        Raises:
+            ValueError: 行宽不一致、含未知字符或传送门不成对
+        """
+        lines = [line.rstrip("\r\n") for line in text.splitlines()]
+        lines = [line for line in lines if line and not line.startswith(";")]
+        if not lines:
+            raise ValueError("关卡为空")
+        cols = len(lines[0])
+        walls = set()
+        portal_cells: Dict[str, List[Tuple[int, int]]] = {}
+        start = None
+        for y, line in enumerate(lines):
+            if len(line) != cols:
+                raise ValueError(f"第 {y + 1} 行宽度为 {len(line)}，应为 {cols}")
+            for x, char in enumerate(line):
+                if char == _WALL:
+                    walls.add((x, y))
+                elif char == _START:
+                    start = (x, y)
+                elif "a" <= char <= "z":
+                    portal_cells.setdefault(char, []).append((x, y))
+                elif char != _FLOOR:
+                    raise ValueError(f"未知字符 {char!r} 位于 ({x}, {y})")
+        portals = {}
+        for name, pair in portal_cells.items():
+            if len(pair) != 2:
+                raise ValueError(f"传送门 {name} 出现了 {len(pair)} 次，应为 2 次")
+            portals[pair[0]] = pair[1]
+            portals[pair[1]] = pair[0]
+        return cls(cols, len(lines), frozenset(walls), portals, start)
+
+    @classmethod
+    def load(cls, path: str) -> "Level":
+        """从文件读取关卡。"""
+        with open(path, encoding="utf-8") as f:
+            return cls.from_text(f.read())
+
+    def to_text(self) -> str:
+        """序列化为关卡文本，传送门按位置顺序依次命名为 a、b、c……"""
+        grid = [[_FLOOR] * self.cols for _ in range(self.rows)]
+        for x, y in self.walls:
+            grid[y][x] = _WALL
+        names: Dict[Tuple[int, int], str] = {}
+        for cell in sorted(self.portals, key=lambda c: (c[1], c[0])):
+            if cell not in names:
+                name = chr(ord("a") + len(names) // 2)
+                names[cell] = name
+                names[self.portals[cell]] = name
+        for (x, y), name in names.items():
+            grid[y][x] = name
+        if self.start is not None:
+            grid[self.start[1]][self.start[0]] = _START
+        return "\n".join("".join(row) for row in grid) + "\n"
+
+    @property
+    def hash(self) -> str:
+        """关卡内容的哈希，作为距离缓存的键。起始位置不影响距离，不参与哈希。"""
+        grid = [[_FLOOR] * self.cols for _ in range(self.rows)]
+        for x, y in self.walls:
+            grid[y][x] = _WALL
+        digest = hashlib.sha256(f"{self.cols}x{self.rows}\n".encode("ascii"))
+        digest.update("\n".join("".join(row) for row in grid).encode("ascii"))
+        for a, b in sorted(self.portals.items()):
+            digest.update(f"\n{a[0]},{a[1]}>{b[0]},{b[1]}".encode("ascii"))
+        return digest.hexdigest()
+
+    def is_blocked(self, x: int, y: int) -> bool:
+        """格子是墙壁或传送门（蛇不能停留）。"""
+        return (x, y) in self.walls or (x, y) in self.portals
+
+    def blocked_cells(self) -> FrozenSet[Tuple[int, int]]:
+        """所有墙壁和传送门格子。"""
+        return self.walls | frozenset(self.portals)
+
+    def start_cells(self) -> List[Tuple[int, int]]:
+        """初始蛇身（蛇尾在前，蛇头在后）。"""
+        if self.start is None:
+            head_x, head_y = self.cols // 2 + 1, self.rows // 2
+        else:
+            head_x, head_y = self.start
+        return [(head_x - 2, head_y), (head_x - 1, head_y), (head_x, head_y)]
+
+    def move_tables(self) -> List[List[int]]:
+        """每个方向一张移动表：格子下标 -> 移动后的格子下标，不能移动时为 -1。
+
+        墙壁和传送门格子本身没有出路；进入传送门时落在配对传送门沿同一方向的下一格，
+        该格是墙壁、传送门或棋盘外时同样不能移动。方向顺序为上、下、左、右。
+        """
+        cols, rows = self.cols, self.rows
+        ids = list(range(cols * rows))
+        blocked = self.blocked_cells()
+
+        def step(x: int, y: int, dx: int, dy: int) -> int:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < cols and 0 <= ny < rows) or (nx, ny) in self.walls:
+                return -1
+            if (nx, ny) in self.portals:
+                nx, ny = self.portals[(nx, ny)]
+                nx, ny = nx + dx, ny + dy
+                if not (0 <= nx < cols and 0 <= ny < rows) or (nx, ny) in blocked:
+                    return -1
+            return ids[ny * cols + nx]
+
+        return [
+            [-1 if (i % cols, i // cols) in blocked else step(i % cols, i // cols, dx, dy) for i in ids]
+            for dx, dy in _DELTAS
+        ]
+
+
+class DistanceField:
+    """关卡的全对静态距离表，distance(a, b) 为一次下标访问。
+
+    表按行存储：table[a * cells + b] 为格子 a 到格子 b 的最短步数（忽略蛇身），
+    不可达为 UNREACHABLE。
+
+    Attributes:
+        cols: 棋盘列数
+        rows: 棋盘行数
+        cells: 格子数
+        table: 距离表（无符号 16 位整数序列）
+        from_cache: 是否直接从缓存文件映射得到
+    """
+
+    def __init__(self, cols: int, rows: int, table, from_cache: bool = False,
+                 mapping: Optional[mmap.mmap] = None):
+        """包装一张距离表。
+
+        Args:
+            cols: 棋盘列数
+            rows: 棋盘行数
+            table: 长度为 cells * cells 的无符号 16 位整数序列
+            from_cache: 是否来自缓存文件
+            mapping: 表所在的内存映射（关闭时一并释放）
+        """
+        self.cols = cols
+        self.rows = rows
+        self.cells = cols * rows
+        self.table = table
+        self.from_cache = from_cache
+        self._mapping = mapping
+
+    def distance(self, a: int, b: int) -> int:
+        """格子下标 a 到 b 的静态最短步数，不可达为 UNREACHABLE。"""
+        return self.table[a * self.cells + b]
+
+    def close(self) -> None:
+        """释放内存映射。"""
+        if self._mapping is not None:
+            self.table.release()
+            self._mapping.close()
+            self._mapping = None
+
+    @staticmethod
+    def compute(cols: int, rows: int, neighbors: List[Tuple[int, ...]]) -> array:
+        """对每个格子做一次 BFS，得到全对距离表。
+
+        Args:
+            cols: 棋盘列数
+            rows: 棋盘行数
+            neighbors: 每个格子的相邻格子下标
+
+        Returns:
+            array('H') 距离表
+        """
+        cells = cols * rows
+        if cells > MAX_DISTANCE_CELLS:
+            raise ValueError(f"关卡共 {cells} 格，超过距离表上限 {MAX_DISTANCE_CELLS}")
+        table = array("H", [UNREACHABLE]) * (cells * cells)
+        queue = [0] * cells
+        for source in range(cells):
+            row = [UNREACHABLE] * cells
+            row[source] = 0
+            queue[0] = source
+            head, tail = 0, 1
+            while head < tail:
+                current = queue[head]
+                head += 1
+                next_distance = row[current] + 1
+                for n in neighbors[current]:
+                    if row[n] == UNREACHABLE:
+                        row[n] = next_distance
+                        queue[tail] = n
+                        tail += 1
+            table[source * cells:(source + 1) * cells] = array("H", row)
+        return table
+
+    @classmethod
+    def load_or_build(cls, level: Level, neighbors: List[Tuple[int, ...]],
+                      cache_dir: Optional[str] = None,
+                      build_limit: int = MAX_SYNC_BUILD_CELLS) -> Optional["DistanceField"]:
+        """从缓存映射关卡的距离表，缓存不存在或失效时计算并写入缓存。
+
+        缓存目录不可写时仍返回内存中的距离表。格子数超过 build_limit 时不在当前线程计算，
+        而是启动后台线程写入缓存并返回 None，下次加载同一关卡时直接映射。
+
+        Args:
+            level: 关卡
+            neighbors: 关卡的相邻格子表（与 level 一一对应）
+            cache_dir: 缓存目录，默认为 DEFAULT_CACHE_DIR
+            build_limit: 允许在当前线程构建的最大格子数
+
+        Returns:
+            距离场；关卡超过 MAX_DISTANCE_CELLS 或正在后台构建时为 None
+        """
+        cells = level.cols * level.rows
+        if cells > MAX_DISTANCE_CELLS:
+            return None
+        path = cache_path(level, cache_dir)
+        field = cls._open_cache(path, level.cols, level.rows)
+        if field is not None:
+            return field
+        if cells > build_limit:
+            _start_background_build(path, level.cols, level.rows, neighbors)
+            return None
+        table = cls.compute(level.cols, level.rows, neighbors)
+        try:
+            _write_cache(path, level.cols, level.rows, table)
+        except OSError:
+            return cls(level.cols, level.rows, table)
+        field = cls._open_cache(path, level.cols, level.rows)
+        if field is not None:
+            field.from_cache = False
+            return field
+        return cls(level.cols, level.rows, table)
+
+    @classmethod
+    def _open_cache(cls, path: str, cols: int, rows: int) -> Optional["DistanceField"]:
+        """映射缓存文件，文件不存在或头部不匹配时返回 None。"""
+        cells = cols * rows
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size != _HEADER.size + cells * cells * 2:
+                    return None
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        magic, version, byteorder, file_cols, file_rows = _HEADER.unpack_from(mapping)
+        if (magic, version, byteorder, file_cols, file_rows) != (
+                DISTANCE_MAGIC, DISTANCE_VERSION, _byteorder_flag(), cols, rows):
+            mapping.close()
+            return None
+        table = memoryview(mapping)[_HEADER.size:].cast("H")
+        return cls(cols, rows, table, from_cache=True, mapping=mapping)
+
+
+def cache_path(level: Level, cache_dir: Optional[str] = None) -> str:
+    """关卡距离缓存文件的路径。"""
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"{level.hash}.dist")
+
+
+def pending_build(level: Level, cache_dir: Optional[str] = None) -> Optional[threading.Thread]:
+    """返回正在为该关卡构建距离表的后台线程，没有时返回 None。"""
+    with _background_lock:
+        return _background_builds.get(cache_path(level, cache_dir))
+
+
+def _start_background_build(path: str, cols: int, rows: int,
+                            neighbors: List[Tuple[int, ...]]) -> None:
+    """在后台线程中计算距离表并写入缓存，同一缓存文件同时只有一个线程在构建。"""
+    def run() -> None:
+        try:
+            _write_cache(path, cols, rows, DistanceField.compute(cols, rows, neighbors))
+        except OSError:
+            pass
+        finally:
+            with _background_lock:
+                del _background_builds[path]
+
+    with _background_lock:
+        if path in _background_builds:
+            return
+        thread = threading.Thread(target=run, name="distance-field", daemon=True)
+        _background_builds[path] = thread
+    thread.start()
+
+
+def _byteorder_flag() -> int:
+    """本机字节序标记，距离表按本机字节序存储以便直接映射。"""
+    return 0 if sys.byteorder == "little" else 1
+
+
+def _write_cache(path: str, cols: int, rows: int, table: array) -> None:
+    """写入缓存文件：先写临时文件再替换，避免其他进程读到半个文件。"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp, "wb") as f:
+            f.write(_HEADER.pack(DISTANCE_MAGIC, DISTANCE_VERSION, _byteorder_flag(), cols, rows))
+            table.tofile(f)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""空闲区域追踪 - 增量维护棋盘上各连通空闲区域的大小。
+
+蛇尾释放格子时用并查集合并，复杂度接近 O(1)；蛇头占据格子时区域可能被切开，
+先在有限范围内做局部搜索确认是否断开，只有确实断开（或超出搜索上限）时才重新标记受影响的区域。
+
+所有缓冲区（并查集数组、搜索队列、访问标记）在构造时一次性分配，稳态下更新不产生新的对象。
+"""
+
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# 占据格子后局部搜索的最大访问格子数
+REGION_LOCAL_BUDGET = 64
+
+# 并查集节点数超过格子数的倍数时整体重建，回收废弃节点
+REGION_REBUILD_FACTOR = 4
+
+
+class RegionTracker:
+    """空闲区域追踪器，快速回答“从某格出发可到达的空闲区域有多大”。
+
+    格子用下标 y * cols + x 表示。每个格子对应一个并查集节点；格子被释放或区域被重新标记时
+    分配新节点，旧节点留在树中作为废弃节点，节点用完时整体重建。
+
+    Attributes:
+        cols: 棋盘列数
+        rows: 棋盘行数
+        local_budget: 占据格子后局部搜索的最大访问格子数
+        occupied_count: 当前被占据的格子数
+        rebuilds: 整体重建次数
+        splits: 检测到区域被切开的次数
+    """
+
+    def __init__(self, cols: int, rows: int, local_budget: int = REGION_LOCAL_BUDGET,
+                 neighbors: Optional[Sequence[Tuple[int, ...]]] = None):
+        """初始化追踪器，初始时整个棋盘为空。
+
+        Args:
+            cols: 棋盘列数
+            rows: 棋盘行数
+            local_budget: 局部搜索上限
+            neighbors: 每个格子的相邻格子下标（可选，须对称），用于带墙壁、传送门的关卡；
+                默认为上下左右四邻格。墙壁格子没有相邻格子，自成一个孤立区域
+        """
+        self.cols = cols
+        self.rows = rows
+        self.local_budget = local_budget
+        cells = cols * rows
+        capacity = REGION_REBUILD_FACTOR * cells
+        self.free = bytearray(b"\x01" * cells)
+        # 节点编号预先创建，分配节点时只移动游标
+        self._ids = list(range(capacity))
+        self.cell_node: List[int] = self._ids[:cells]
+        self.parent: List[int] = self._ids[:]
+        self.size: List[int] = [0] * capacity
+        self.node_count = cells
+        self.occupied_count = 0
+        self.rebuilds = 0
+        self.splits = 0
+        if neighbors is None:
+            self._neighbors = [self._cell_neighbors(i) for i in range(cells)]
+        else:
+            self._neighbors = list(neighbors)
+        # 局部搜索缓冲：队列与按轮次递增的访问标记（0 表示未访问）
+        self._queue: List[int] = [0] * cells
+        self._mark = bytearray(cells)
+        self._zero_marks = bytes(cells)
+        self._stamp = 0
+        self._starts: List[int] = [0] * 4
+        self._rebuild()
+
+    def _cell_neighbors(self, index: int) -> Tuple[int, ...]:
+        """计算格子的相邻格子下标。"""
+        x, y = index % self.cols, index // self.cols
+        result = []
+        for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.cols and 0 <= ny < self.rows:
+                result.append(self._ids[ny * self.cols + nx])
+        return tuple(result)
+
+    def reset(self, occupied: Iterable[Tuple[int, int]]) -> None:
+        """按给定的占据格子重新计算所有区域。
+
+        Args:
+            occupied: 被占据的格子坐标
+        """
+        free = self.free
+        free[:] = b"\x01" * len(free)
+        for x, y in occupied:
+            free[y * self.cols + x] = 0
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        """丢弃所有节点，按当前空闲格子原地重建并查集。"""
+        cells = self.cols * self.rows
+        ids = self._ids
+        free = self.free
+        for i in range(cells):
+            node = ids[i]
+            self.cell_node[i] = node
+            self.parent[i] = node
+            self.size[i] = 1 if free[i] else 0
+        self.node_count = cells
+        self.occupied_count = cells - sum(free)
+        for i in range(cells):
+            if free[i]:
+                for n in self._neighbors[i]:
+                    if n < i and free[n]:
+                        self._union(i, n)
+        self.rebuilds += 1
+
+    def _find(self, node: int) -> int:
+        """查找节点所在集合的根（路径减半）。"""
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def _union(self, a: int, b: int) -> None:
+        """合并两个格子所在的区域（按大小合并）。"""
+        ra = self._find(self.cell_node[a])
+        rb = self._find(self.cell_node[b])
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+    def _new_node(self, size: int) -> int:
+        """分配一个新的根节点。"""
+        node = self._ids[self.node_count]
+        self.node_count += 1
+        self.parent[node] = node
+        self.size[node] = size
+        return node
+
+    def is_free(self, x: int, y: int) -> bool:
+        """检查格子是否空闲。"""
+        return bool(self.free[y * self.cols + x])
+
+    def region_size(self, x: int, y: int) -> int:
+        """返回包含该格子的空闲区域大小。
+
+        Args:
+            x: X 坐标
+            y: Y 坐标
+
+        Returns:
+            区域格子数，格子被占据时返回 0
+        """
+        return self.region_size_at(y * self.cols + x)
+
+    def region_size_at(self, index: int) -> int:
+        """按下标返回包含该格子的空闲区域大小，格子被占据时返回 0。"""
+        if not self.free[index]:
+            return 0
+        return self.size[self._find(self.cell_node[index])]
+
+    def release(self, x: int, y: int) -> None:
+        """释放一个格子（例如蛇尾移走），并与相邻空闲区域合并。
+
+        Args:
+            x: X 坐标
+            y: Y 坐标
+        """
+        self.release_at(y * self.cols + x)
+
+    def release_at(self, index: int) -> None:
+        """按下标释放一个格子。"""
+        if self.free[index]:
+            return
+        self.free[index] = 1
+        if self.node_count >= len(self._ids):
+            self._rebuild()
+            return
+        self.occupied_count -= 1
+        self.cell_node[index] = self._new_node(1)
+        free = self.free
+        for n in self._neighbors[index]:
+            if free[n]:
+                self._union(index, n)
+
+    def occupy(self, x: int, y: int) -> None:
+        """占据一个格子（例如蛇头进入），必要时拆分被切开的区域。
+
+        Args:
+            x: X 坐标
+            y: Y 坐标
+        """
+        self.occupy_at(y * self.cols + x)
+
+    def occupy_at(self, index: int) -> None:
+        """按下标占据一个格子。"""
+        free = self.free
+        if not free[index]:
+            return
+        if self.node_count + 4 > len(self._ids):
+            # 拆分最多新增 3 个节点，节点不够时直接整体重建
+            free[index] = 0
+            self._rebuild()
+            return
+        root = self._find(self.cell_node[index])
+        free[index] = 0
+        self.occupied_count += 1
+        self.size[root] -= 1
+
+        starts = self._starts
+        count = 0
+        for n in self._neighbors[index]:
+            if free[n]:
+                starts[count] = n
+                count += 1
+        if count < 2:
+            return
+
+        # 局部搜索：在上限内能完整探索的小区域，若与其他邻格不连通则单独标记。
+        # 每轮搜索使用新的标记值，已被之前某轮访问过的邻格说明彼此连通，不再搜索。
+        mark = self._mark
+        first_stamp = self._stamp + 1
+        if first_stamp + 2 * count > 255:
+            mark[:] = self._zero_marks
+            first_stamp = 1
+        unresolved = 0
+        for k in range(count):
+            start = starts[k]
+            if mark[start] >= first_stamp:
+                # 与之前某个邻格连通：若对方是超出上限的大区域，本格也并入其中
+                continue
+            stamp = first_stamp + k
+            visited, complete = self._flood(start, stamp, self.local_budget)
+            if not complete:
+                starts[unresolved] = start
+                unresolved += 1
+            elif self._has_unvisited(starts, k + 1, count, first_stamp) or unresolved:
+                self._relabel(visited, root)
+        self._stamp = first_stamp + count - 1
+
+        # 多个超出上限的邻格仍可能彼此不连通，只能完整搜索确认
+        while unresolved > 1:
+            unresolved -= 1
+            start = starts[unresolved]
+            self._stamp += 1
+            visited, _ = self._flood(start, self._stamp, -1)
+            remaining = 0
+            for k in range(unresolved):
+                if mark[starts[k]] != self._stamp:
+                    starts[remaining] = starts[k]
+                    remaining += 1
+            unresolved = remaining
+            if unresolved:
+                self._relabel(visited, root)
+
+    def _has_unvisited(self, starts: List[int], begin: int, end: int, first_stamp: int) -> bool:
+        """检查 starts[begin:end] 中是否还有未被任何一轮搜索访问的邻格。"""
+        mark = self._mark
+        for k in range(begin, end):
+            if mark[starts[k]] < first_stamp:
+                return True
+        return False
+
+    def _flood(self, start: int, stamp: int, budget: int) -> Tuple[int, bool]:
+        """从起点出发在空闲格子中做 BFS，访问到的格子依次存入队列缓冲。
+
+        Args:
+            start: 起点下标
+            stamp: 本轮搜索的访问标记
+            budget: 最大访问格子数，负数表示不限
+
+        Returns:
+            (访问格子数, 是否完整探索了整个区域)
+        """
+        free = self.free
+        mark = self._mark
+        queue = self._queue
+        neighbors = self._neighbors
+        mark[start] = stamp
+        queue[0] = start
+        head = 0
+        tail = 1
+        while head < tail:
+            if 0 <= budget < tail:
+                return tail, False
+            current = queue[head]
+            head += 1
+            for n in neighbors[current]:
+                if free[n] and mark[n] != stamp:
+                    mark[n] = stamp
+                    queue[tail] = n
+                    tail += 1
+        return tail, True
+
+    def _relabel(self, count: int, old_root: int) -> None:
+        """把队列缓冲中最近一次搜索到的格子从原区域中分离出来，作为一个新区域。"""
+        node = self._new_node(count)
+        queue = self._queue
+        for k in range(count):
+            self.cell_node[queue[k]] = node
+        self.size[old_root] -= count
+        self.splits += 1
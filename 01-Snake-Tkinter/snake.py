@@ -1,11 +1,28 @@
 # -*- coding: utf-8 -*-
 """贪吃蛇游戏 - 使用 Tkinter 实现的经典贪吃蛇游戏，支持人机对战和 AI 自动玩模式。"""
 
-import random
+import sys
 import tkinter as tk
 import tkinter.font as tkfont
-from collections import deque
-from typing import Optional, Tuple, List, Set, Generator, Any
+from typing import Optional
+
+from colors import (
+    COLOR_BACKGROUND,
+    COLOR_SNAKE_BODY,
+    COLOR_SNAKE_HEAD,
+    COLOR_FOOD,
+    COLOR_WALL,
+    COLOR_PORTAL,
+    COLOR_TEXT,
+)
+from engine import (
+    SnakeEngine,
+    DIRECTION_UP,
+    DIRECTION_DOWN,
+    DIRECTION_LEFT,
+    DIRECTION_RIGHT,
+)
+from level import Level
 
 # 游戏常量
 DEFAULT_WIDTH = 600
@@ -19,19 +36,6 @@ FONT_SIZE_BUTTON = 18
 FONT_SIZE_SCORE = 14
 FONT_SIZE_GAME_OVER = 24
 
-# 颜色常量
-COLOR_BACKGROUND = "black"
-COLOR_SNAKE_BODY = "green"
-COLOR_SNAKE_HEAD = "lime"
-COLOR_FOOD = "red"
-COLOR_TEXT = "white"
-
-# 方向常量
-DIRECTION_UP = "Up"
-DIRECTION_DOWN = "Down"
-DIRECTION_LEFT = "Left"
-DIRECTION_RIGHT = "Right"
-
 # UI 文本
 UI_TEXT_TITLE = "请选择模式"
 UI_TEXT_HUMAN = "人类玩家"
@@ -40,9 +44,11 @@ UI_TEXT_GAME_OVER = "游戏结束\n按回车键重新开始"
 UI_TEXT_SCORE = "得分：{score}"
 
 
-class SnakeGame:
+class SnakeGame(SnakeEngine):
     """贪吃蛇游戏主类，支持人机对战和 AI 自动玩模式。
 
+    游戏逻辑由 SnakeEngine 提供，本类负责 Tkinter 界面与键盘输入。
+
     Attributes:
         width: 游戏窗口宽度（像素）
         height: 游戏窗口高度（像素）
@@ -53,7 +59,7 @@ class SnakeGame:
 
     def __init__(self, width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT,
                  cell_size: int = DEFAULT_CELL_SIZE, speed: int = DEFAULT_SPEED_MS,
-                 auto_play: bool = False):
+                 auto_play: bool = False, level: Optional[Level] = None):
         """初始化游戏。
 
         Args:
@@ -62,14 +68,16 @@ class SnakeGame:
             cell_size: 单元格大小
             speed: 游戏速度（毫秒）
             auto_play: 是否启用 AI 模式
+            level: 关卡地图（可选），指定时窗口大小由关卡尺寸决定
         """
+        if level is not None:
+            width = level.cols * cell_size
+            height = level.rows * cell_size
         self.width = width
         self.height = height
         self.cell_size = cell_size
-        self.cols = width // cell_size
-        self.rows = height // cell_size
+        super().__init__(width // cell_size, height // cell_size, auto_play=auto_play, level=level)
         self.speed = speed
-        self.auto_play = auto_play
 
         self.root = tk.Tk()
         self.root.title("贪吃蛇")
@@ -80,19 +88,11 @@ class SnakeGame:
         self.canvas = tk.Canvas(self.root, width=self.width, height=self.height, bg=COLOR_BACKGROUND)
         self.canvas.pack()
 
-        self.score = 0
         self.score_var = tk.StringVar()
         self.score_var.set(UI_TEXT_SCORE.format(score=0))
 
         self._create_score_label()
 
-        self.direction = DIRECTION_RIGHT
-        self.pending_direction = DIRECTION_RIGHT
-        self.direction_changed_this_tick = False
-        self.snake: List[Tuple[int, int]] = []
-        self.food: Optional[Tuple[int, int]] = None
-        self.game_over = False
-
         self._bind_keys()
 
         self.mode_button_frame: Optional[tk.Frame] = None
@@ -153,18 +153,8 @@ class SnakeGame:
         """初始化游戏状态，开始新游戏。"""
         self.canvas.delete("all")
         self._destroy_mode_buttons()
-        self.score = 0
         self.score_var.set(UI_TEXT_SCORE.format(score=0))
-        self.direction = DIRECTION_RIGHT
-        self.pending_direction = DIRECTION_RIGHT
-        self.direction_changed_this_tick = False
-        self.game_over = False
-
-        start_x = self.cols // 2
-        start_y = self.rows // 2
-        self.snake = [(start_x - 1, start_y), (start_x, start_y), (start_x + 1, start_y)]
-
-        self.place_food()
+        self.reset()
         self.draw()
         self.schedule_move()
 
@@ -229,198 +219,24 @@ class SnakeGame:
         if not self.game_over:
             self.root.after(self.speed, self.move)
 
-    def change_direction(self, new_direction: str) -> None:
-        """改变蛇的移动方向。
-
-        Args:
-            new_direction: 新方向（Up/Down/Left/Right）
-
-        Note:
-            禁止 180 度转向，且每个 tick 只允许改变一次方向。
-        """
-        opposite = {
-            DIRECTION_UP: DIRECTION_DOWN,
-            DIRECTION_DOWN: DIRECTION_UP,
-            DIRECTION_LEFT: DIRECTION_RIGHT,
-            DIRECTION_RIGHT: DIRECTION_LEFT,
-        }
-        # 禁止 180 度转向且每个 tick 只允许改变一次方向
-        if opposite.get(new_direction) != self.direction and not self.direction_changed_this_tick:
-            self.pending_direction = new_direction
-            self.direction_changed_this_tick = True
-
     def move(self) -> None:
-        """执行蛇的移动逻辑。"""
+        """执行蛇的移动逻辑并刷新画面。"""
         if self.game_over:
             return
 
-        if self.auto_play:
-            self.pending_direction = self.get_ai_direction()
-
-        self.direction = self.pending_direction
-        self.direction_changed_this_tick = False  # 重置方向改变标记
-
-        head_x, head_y = self.snake[-1]
-        if self.direction == DIRECTION_UP:
-            head_y -= 1
-        elif self.direction == DIRECTION_DOWN:
-            head_y += 1
-        elif self.direction == DIRECTION_LEFT:
-            head_x -= 1
-        elif self.direction == DIRECTION_RIGHT:
-            head_x += 1
-
-        if head_x < 0 or head_x >= self.cols or head_y < 0 or head_y >= self.rows:
-            self.end_game()
-            return
-
-        new_head = (head_x, head_y)
-
-        if new_head in self.snake:
-            self.end_game()
-            return
-
-        self.snake.append(new_head)
-
-        if new_head == self.food:
-            self.score += 1
+        score = self.score
+        self.step()
+        if self.score != score:
             self.score_var.set(UI_TEXT_SCORE.format(score=self.score))
-            self.place_food()
-        else:
-            self.snake.pop(0)
+        if self.game_over:
+            return
 
         self.draw()
+        # 立即刷新画布，使输入延迟统计覆盖到画面真正更新为止
+        self.root.update_idletasks()
+        self.mark_rendered()
         self.schedule_move()
 
-    def is_inside(self, x: int, y: int) -> bool:
-        """检查坐标是否在游戏边界内。
-
-        Args:
-            x: X 坐标
-            y: Y 坐标
-
-        Returns:
-            如果坐标在边界内返回 True，否则 False
-        """
-        return 0 <= x < self.cols and 0 <= y < self.rows
-
-    def neighbors(self, x: int, y: int) -> Generator[Tuple[int, int], None, None]:
-        """获取相邻的四个方向坐标。
-
-        Args:
-            x: X 坐标
-            y: Y 坐标
-
-        Yields:
-            相邻坐标的元组
-        """
-        for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0)):
-            nx = x + dx
-            ny = y + dy
-            if self.is_inside(nx, ny):
-                yield nx, ny
-
-    def bfs(self, start: Tuple[int, int], goal: Tuple[int, int],
-            blocked: Set[Tuple[int, int]]) -> Optional[List[Tuple[int, int]]]:
-        """使用 BFS 寻找从起点到终点的路径。
-
-        Args:
-            start: 起点坐标
-            goal: 终点坐标
-            blocked: 障碍物坐标集合
-
-        Returns:
-            路径坐标列表，如果找不到路径返回 None
-        """
-        queue = deque([start])
-        came_from: dict[Tuple[int, int], Optional[Tuple[int, int]]] = {start: None}
-        while queue:
-            x, y = queue.popleft()
-            if (x, y) == goal:
-                path = []
-                current = goal
-                while current is not None:
-                    path.append(current)
-                    current = came_from[current]
-                path.reverse()
-                return path
-            for nx, ny in self.neighbors(x, y):
-                if (nx, ny) in blocked:
-                    continue
-                if (nx, ny) in came_from:
-                    continue
-                came_from[(nx, ny)] = (x, y)
-                queue.append((nx, ny))
-        return None
-
-    def get_ai_direction(self) -> str:
-        """使用 BFS 算法获取 AI 的移动方向。
-
-        Returns:
-            最佳移动方向
-        """
-        head_x, head_y = self.snake[-1]
-        safe_candidates: List[Tuple[str, int, int]] = []
-
-        for d in [DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT]:
-            # 检查是否是相反方向
-            opposite = {
-                DIRECTION_UP: DIRECTION_DOWN,
-                DIRECTION_DOWN: DIRECTION_UP,
-                DIRECTION_LEFT: DIRECTION_RIGHT,
-                DIRECTION_RIGHT: DIRECTION_LEFT,
-            }
-            if opposite.get(d) == self.direction and len(self.snake) > 1:
-                continue
-
-            nx, ny = head_x, head_y
-            if d == DIRECTION_UP:
-                ny -= 1
-            elif d == DIRECTION_DOWN:
-                ny += 1
-            elif d == DIRECTION_LEFT:
-                nx -= 1
-            elif d == DIRECTION_RIGHT:
-                nx += 1
-
-            if not self.is_inside(nx, ny):
-                continue
-            if (nx, ny) in self.snake[:-1]:
-                continue
-            safe_candidates.append((d, nx, ny))
-
-        if not safe_candidates:
-            return self.direction
-
-        if self.food is None:
-            return safe_candidates[0][0]
-
-        blocked = set(self.snake[:-1])
-        best_dir: Optional[str] = None
-        best_dist: Optional[int] = None
-
-        for d, nx, ny in safe_candidates:
-            path = self.bfs((nx, ny), self.food, blocked)
-            if path is None:
-                continue
-            dist = len(path)
-            if best_dist is None or dist < best_dist:
-                best_dist = dist
-                best_dir = d
-
-        if best_dir is not None:
-            return best_dir
-
-        return safe_candidates[0][0]
-
-    def place_food(self) -> None:
-        """在空白位置放置食物。"""
-        empty_cells = [(x, y) for x in range(self.cols) for y in range(self.rows) if (x, y) not in self.snake]
-        if not empty_cells:
-            self.end_game()
-            return
-        self.food = random.choice(empty_cells)
-
     def draw_cell(self, x: int, y: int, color: str) -> None:
         """绘制单个单元格。
 
@@ -438,6 +254,10 @@ class SnakeGame:
     def draw(self) -> None:
         """绘制游戏画面。"""
         self.canvas.delete("all")
+        for x, y in self.level.walls:
+            self.draw_cell(x, y, COLOR_WALL)
+        for x, y in self.level.portals:
+            self.draw_cell(x, y, COLOR_PORTAL)
         for x, y in self.snake[:-1]:
             self.draw_cell(x, y, COLOR_SNAKE_BODY)
         head_x, head_y = self.snake[-1]
@@ -457,7 +277,7 @@ class SnakeGame:
 
     def end_game(self) -> None:
         """结束游戏。"""
-        self.game_over = True
+        super().end_game()
         self.draw()
 
     def restart(self, event: Optional[tk.Event] = None) -> None:
@@ -475,5 +295,6 @@ class SnakeGame:
 
 
 if __name__ == "__main__":
-    game = SnakeGame(auto_play=True)
+    # 可选参数：关卡文件路径，例如 python snake.py levels/arena.txt
+    game = SnakeGame(auto_play=True, level=Level.load(sys.argv[1]) if len(sys.argv) > 1 else None)
     game.run()
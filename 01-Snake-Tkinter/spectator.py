@@ -0,0 +1,604 @@
+# -*- coding: utf-8 -*-
+"""观战服务器 - 通过本地 TCP 或 Unix 套接字向多个观众广播对局。
+
+协议说明：每条消息为 varint(负载长度) + 负载，负载首字节为消息类型。
+    关键帧 MSG_KEYFRAME: tick, cols, rows, score, game_over, 食物下标, 蛇长, 蛇身下标（尾 → 头）
+    增量帧 MSG_DELTA: flags, [新蛇头下标], [新食物下标]
+坐标统一编码为下标 y * cols + x，食物下标等于 cols * rows 表示没有食物。
+
+每个 tick 只编码一次增量帧，写入所有观众共享的环形缓冲（带全局序号），编码代价与蛇长无关，
+发布代价与观众人数无关。每个观众的协程按自己的游标从环形缓冲读取；
+观众加入时先收到关键帧，游标落后超出环形缓冲的慢速观众会被丢帧，之后改发一次关键帧重新同步。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+from collections import deque
+from typing import Optional, Tuple, List, Deque, Any, Iterator, AsyncIterator
+
+from engine import SnakeEngine
+
+# 消息类型
+MSG_KEYFRAME = 0x01
+MSG_DELTA = 0x02
+
+# 增量帧标志位
+DELTA_HEAD = 0x01
+DELTA_TAIL = 0x02
+DELTA_FOOD = 0x04
+DELTA_GAME_OVER = 0x08
+
+# 服务器默认参数
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING_FRAMES = 64
+DEFAULT_MAX_WRITE_BUFFER = 64 * 1024
+DEFAULT_TICK_MS = 100
+
+# 终端观众渲染字符
+VIEW_CHAR_EMPTY = "."
+VIEW_CHAR_BODY = "o"
+VIEW_CHAR_HEAD = "@"
+VIEW_CHAR_FOOD = "*"
+
+
+def encode_varint(value: int, out: bytearray) -> None:
+    """将非负整数按 LEB128 varint 编码追加到缓冲区。
+
+    Args:
+        value: 非负整数
+        out: 输出缓冲区
+    """
+    if value < 0:
+        raise ValueError("varint 只支持非负整数")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """从缓冲区解码一个 varint。
+
+    Args:
+        data: 输入缓冲区
+        pos: 起始位置
+
+    Returns:
+        (数值, 下一个位置)
+
+    Raises:
+        IndexError: 数据不完整
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _frame(payload: bytearray) -> bytes:
+    """为负载加上 varint 长度前缀。"""
+    out = bytearray()
+    encode_varint(len(payload), out)
+    out += payload
+    return bytes(out)
+
+
+class BoardMirror:
+    """服务器端的棋盘镜像，用增量维护蛇身以便随时生成关键帧。
+
+    Attributes:
+        cols: 棋盘列数
+        rows: 棋盘行数
+        snake: 蛇身下标（尾 → 头）
+        food: 食物下标，无食物时为 cols * rows
+    """
+
+    def __init__(self, cols: int = 0, rows: int = 0):
+        """初始化镜像。
+
+        Args:
+            cols: 棋盘列数
+            rows: 棋盘行数
+        """
+        self.cols = cols
+        self.rows = rows
+        self.tick = 0
+        self.score = 0
+        self.game_over = False
+        self.snake: Deque[int] = deque()
+        self.food = cols * rows
+
+    def load(self, cols: int, rows: int, snake: List[Tuple[int, int]],
+             food: Optional[Tuple[int, int]], score: int, tick: int, game_over: bool) -> None:
+        """从完整状态重建镜像（仅在新游戏开始时调用）。"""
+        self.cols = cols
+        self.rows = rows
+        self.snake = deque(y * cols + x for x, y in snake)
+        self.food = self._food_index(food)
+        self.score = score
+        self.tick = tick
+        self.game_over = game_over
+
+    def _food_index(self, food: Optional[Tuple[int, int]]) -> int:
+        """将食物坐标转换为下标。"""
+        if food is None:
+            return self.cols * self.rows
+        return food[1] * self.cols + food[0]
+
+    def encode_keyframe(self) -> bytes:
+        """编码当前状态的关键帧。
+
+        Returns:
+            带长度前缀的关键帧
+        """
+        payload = bytearray((MSG_KEYFRAME,))
+        for value in (self.tick, self.cols, self.rows, self.score, int(self.game_over),
+                      self.food, len(self.snake)):
+            encode_varint(value, payload)
+        for index in self.snake:
+            encode_varint(index, payload)
+        return _frame(payload)
+
+    def apply_step(self, head: Optional[Tuple[int, int]], tail_removed: bool,
+                   food: Optional[Tuple[int, int]], game_over: bool) -> bytes:
+        """应用一个 tick 的变化并编码增量帧，代价与蛇长无关。
+
+        Args:
+            head: 新蛇头坐标（无移动时为 None）
+            tail_removed: 是否移除了蛇尾
+            food: 当前食物坐标
+            game_over: 游戏是否结束
+
+        Returns:
+            带长度前缀的增量帧
+        """
+        flags = 0
+        payload = bytearray((MSG_DELTA, 0))
+        if head is not None:
+            flags |= DELTA_HEAD
+            head_index = head[1] * self.cols + head[0]
+            self.snake.append(head_index)
+            encode_varint(head_index, payload)
+            self.tick += 1
+            if tail_removed:
+                flags |= DELTA_TAIL
+                self.snake.popleft()
+            else:
+                self.score += 1
+        food_index = self._food_index(food)
+        if food_index != self.food:
+            flags |= DELTA_FOOD
+            self.food = food_index
+            encode_varint(food_index, payload)
+        if game_over:
+            flags |= DELTA_GAME_OVER
+            self.game_over = True
+        payload[1] = flags
+        return _frame(payload)
+
+
+class FrameDecoder:
+    """流式帧解码器，处理 TCP 分包与粘包。"""
+
+    def __init__(self) -> None:
+        """初始化解码器。"""
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        """喂入数据并产出完整的负载。
+
+        Args:
+            data: 新收到的字节
+
+        Yields:
+            完整的消息负载
+        """
+        self.buffer += data
+        pos = 0
+        while pos < len(self.buffer):
+            try:
+                length, start = decode_varint(self.buffer, pos)
+            except IndexError:
+                break
+            end = start + length
+            if end > len(self.buffer):
+                break
+            yield bytes(self.buffer[start:end])
+            pos = end
+        del self.buffer[:pos]
+
+
+class SpectatorState:
+    """观众端状态，由关键帧和增量帧重建。"""
+
+    def __init__(self) -> None:
+        """初始化观众端状态。"""
+        self.mirror = BoardMirror()
+        self.synced = False
+
+    def apply(self, payload: bytes) -> None:
+        """应用一条消息负载。
+
+        Args:
+            payload: 消息负载
+
+        Raises:
+            ValueError: 未知的消息类型
+        """
+        kind = payload[0]
+        mirror = self.mirror
+        if kind == MSG_KEYFRAME:
+            pos = 1
+            values = []
+            for _ in range(7):
+                value, pos = decode_varint(payload, pos)
+                values.append(value)
+            tick, cols, rows, score, game_over, food, length = values
+            snake: Deque[int] = deque()
+            for _ in range(length):
+                index, pos = decode_varint(payload, pos)
+                snake.append(index)
+            mirror.cols, mirror.rows = cols, rows
+            mirror.tick, mirror.score, mirror.game_over = tick, score, bool(game_over)
+            mirror.food, mirror.snake = food, snake
+            self.synced = True
+        elif kind == MSG_DELTA:
+            if not self.synced:
+                return
+            flags = payload[1]
+            pos = 2
+            if flags & DELTA_HEAD:
+                head, pos = decode_varint(payload, pos)
+                mirror.snake.append(head)
+                mirror.tick += 1
+                if flags & DELTA_TAIL:
+                    mirror.snake.popleft()
+                else:
+                    mirror.score += 1
+            if flags & DELTA_FOOD:
+                mirror.food, pos = decode_varint(payload, pos)
+            if flags & DELTA_GAME_OVER:
+                mirror.game_over = True
+        else:
+            raise ValueError(f"未知的消息类型: {kind}")
+
+    def cells(self) -> List[Tuple[int, int]]:
+        """返回蛇身坐标列表（尾 → 头）。"""
+        cols = self.mirror.cols
+        return [(index % cols, index // cols) for index in self.mirror.snake]
+
+    def food(self) -> Optional[Tuple[int, int]]:
+        """返回食物坐标，无食物时为 None。"""
+        mirror = self.mirror
+        if mirror.food >= mirror.cols * mirror.rows:
+            return None
+        return mirror.food % mirror.cols, mirror.food // mirror.cols
+
+    def render(self) -> str:
+        """将当前状态渲染为文本画面。"""
+        mirror = self.mirror
+        grid = [VIEW_CHAR_EMPTY] * (mirror.cols * mirror.rows)
+        for index in mirror.snake:
+            grid[index] = VIEW_CHAR_BODY
+        if mirror.snake:
+            grid[mirror.snake[-1]] = VIEW_CHAR_HEAD
+        if mirror.food < len(grid):
+            grid[mirror.food] = VIEW_CHAR_FOOD
+        lines = ["".join(grid[y * mirror.cols:(y + 1) * mirror.cols]) for y in range(mirror.rows)]
+        status = f"tick {mirror.tick}  得分：{mirror.score}"
+        if mirror.game_over:
+            status += "  游戏结束"
+        lines.append(status)
+        return "\n".join(lines)
+
+
+class _Client:
+    """单个观众连接的发送状态。"""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        # 下一个要发送的帧序号，-1 表示还没有发送过关键帧
+        self.cursor = -1
+        self.dropped_frames = 0
+
+
+class SpectatorServer:
+    """观战广播服务器，可作为 SnakeEngine 的监听器使用。
+
+    引擎事件可以来自任意线程（例如 Tk 主循环），会被转交到服务器的事件循环处理。
+
+    Attributes:
+        host: 监听地址（仅用于 TCP）
+        port: 监听端口，0 表示自动分配
+        path: Unix 套接字路径，设置后忽略 host/port
+        max_pending_frames: 共享环形缓冲的容量，即观众最多能落后的帧数
+        max_write_buffer: 每个观众的写缓冲上限，超过后该观众暂停发送直到缓冲排空
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 path: Optional[str] = None,
+                 max_pending_frames: int = DEFAULT_MAX_PENDING_FRAMES,
+                 max_write_buffer: int = DEFAULT_MAX_WRITE_BUFFER):
+        """初始化服务器。
+
+        Args:
+            host: 监听地址
+            port: 监听端口
+            path: Unix 套接字路径（可选）
+            max_pending_frames: 共享环形缓冲的容量
+            max_write_buffer: 每个观众的写缓冲上限（字节）
+        """
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_pending_frames = max_pending_frames
+        self.max_write_buffer = max_write_buffer
+
+        self.mirror = BoardMirror()
+        self.clients: List[_Client] = []
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+        # 共享环形缓冲：序号为 seq 的帧存放在 seq % 容量 处
+        self._ring: List[bytes] = [b""] * max_pending_frames
+        self._seq = 0
+        # 最近一次重置对应的序号，更早的帧属于上一局
+        self._base = 0
+        self._keyframe = b""
+        self._keyframe_seq = -1
+        # 每次发布时完成并替换的 future，空闲的观众协程在其上等待
+        self._published: Optional[asyncio.Future] = None
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    async def start(self) -> None:
+        """在当前事件循环中启动服务器。"""
+        self._loop = asyncio.get_running_loop()
+        self._published = self._loop.create_future()
+        if self.path is not None:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._server = await asyncio.start_unix_server(self._handle_client, path=self.path)
+        else:
+            self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """关闭服务器并断开所有观众。"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for client in list(self.clients):
+            client.writer.close()
+        self.clients.clear()
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def start_in_thread(self) -> None:
+        """在后台线程中运行服务器事件循环，供 Tk 等同步程序使用。"""
+        started = threading.Event()
+
+        def run() -> None:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="spectator-server", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    # 引擎监听器接口
+
+    def on_reset(self, engine: SnakeEngine) -> None:
+        """新游戏开始：同步完整状态并向所有观众发送关键帧。"""
+        self._dispatch(self.publish_reset, engine.cols, engine.rows, list(engine.snake),
+                       engine.food, engine.score, engine.tick, engine.game_over)
+
+    def on_step(self, engine: SnakeEngine, new_head: Tuple[int, int],
+                removed_tail: Optional[Tuple[int, int]]) -> None:
+        """一个 tick 结束：广播增量帧。"""
+        self._dispatch(self.publish_step, new_head, removed_tail is not None,
+                       engine.food, engine.game_over)
+
+    def on_game_over(self, engine: SnakeEngine) -> None:
+        """游戏结束：广播结束标志。"""
+        self._dispatch(self.publish_step, None, False, engine.food, True)
+
+    def _dispatch(self, callback: Any, *args: Any) -> None:
+        """将引擎事件转交到服务器事件循环。"""
+        if self._loop is None:
+            callback(*args)
+        else:
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    # 广播
+
+    def publish_reset(self, cols: int, rows: int, snake: List[Tuple[int, int]],
+                      food: Optional[Tuple[int, int]], score: int = 0, tick: int = 0,
+                      game_over: bool = False) -> None:
+        """载入完整状态，所有观众下一次发送时收到关键帧。"""
+        self.mirror.load(cols, rows, snake, food, score, tick, game_over)
+        # 占用一个序号，使所有游标都落在 _base 之前
+        self._seq += 1
+        self._base = self._seq
+        self._wake()
+
+    def publish_step(self, head: Optional[Tuple[int, int]], tail_removed: bool,
+                     food: Optional[Tuple[int, int]], game_over: bool = False) -> None:
+        """编码一次增量帧并写入共享环形缓冲，代价与观众人数无关。
+
+        Args:
+            head: 新蛇头坐标（无移动时为 None）
+            tail_removed: 是否移除了蛇尾
+            food: 当前食物坐标
+            game_over: 游戏是否结束
+        """
+        frame = self.mirror.apply_step(head, tail_removed, food, game_over)
+        self._ring[self._seq % len(self._ring)] = frame
+        self._seq += 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """唤醒所有等待新帧的观众协程。"""
+        published = self._published
+        if published is not None:
+            self._published = published.get_loop().create_future()
+            published.set_result(None)
+
+    def _collect(self, client: _Client) -> Tuple[bytes, int]:
+        """取出观众游标之后的所有帧，落后超出环形缓冲时改为关键帧。
+
+        Returns:
+            (要写出的字节, 帧数)
+        """
+        seq = self._seq
+        cursor = client.cursor
+        ring = self._ring
+        client.cursor = seq
+        if cursor >= self._base and seq - cursor <= len(ring):
+            # 一次写出所有积压帧，减少系统调用
+            size = len(ring)
+            return b"".join([ring[i % size] for i in range(cursor, seq)]), seq - cursor
+        if cursor >= self._base:
+            # 慢速观众：游标已被环形缓冲覆盖，丢弃这些帧，用关键帧重新同步
+            client.dropped_frames += seq - cursor
+            self.frames_dropped += seq - cursor
+        if self._keyframe_seq != seq:
+            # 同一时刻重新同步的观众共享同一份关键帧
+            self._keyframe = self.mirror.encode_keyframe()
+            self._keyframe_seq = seq
+        return self._keyframe, 1
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        """按观众自己的游标发送帧，直到连接断开。"""
+        client = _Client(writer)
+        writer.transport.set_write_buffer_limits(high=self.max_write_buffer)
+        self.clients.append(client)
+        closed = asyncio.ensure_future(reader.read())
+        try:
+            while not writer.is_closing():
+                if client.cursor == self._seq:
+                    done, _ = await asyncio.wait({self._published, closed},
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    if closed in done:
+                        break
+                    continue
+                data, count = self._collect(client)
+                writer.write(data)
+                self.frames_sent += count
+                # 写缓冲超过上限时在这里等待，期间环形缓冲继续前进
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            closed.cancel()
+            if client in self.clients:
+                self.clients.remove(client)
+            writer.close()
+
+
+async def _read_frames(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+    """从流中读取完整的消息负载。"""
+    decoder = FrameDecoder()
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            return
+        for payload in decoder.feed(data):
+            yield payload
+
+
+async def run_viewer(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                     path: Optional[str] = None, out: Any = None) -> None:
+    """最简观众端：连接服务器并在终端中渲染画面。
+
+    Args:
+        host: 服务器地址
+        port: 服务器端口
+        path: Unix 套接字路径（可选）
+        out: 输出流，默认 sys.stdout
+    """
+    out = out if out is not None else sys.stdout
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    state = SpectatorState()
+    try:
+        async for payload in _read_frames(reader):
+            state.apply(payload)
+            if state.synced:
+                # 清屏并回到左上角
+                out.write("\x1b[H\x1b[2J" + state.render() + "\n")
+                out.flush()
+    finally:
+        writer.close()
+
+
+async def run_headless_game(server: SpectatorServer, cols: int, rows: int,
+                            tick_ms: int = DEFAULT_TICK_MS) -> None:
+    """运行无界面的 AI 对局并通过服务器广播，游戏结束后自动重新开始。
+
+    Args:
+        server: 已启动的观战服务器
+        cols: 棋盘列数
+        rows: 棋盘行数
+        tick_ms: 每个 tick 的间隔（毫秒）
+    """
+    engine = SnakeEngine(cols, rows, auto_play=True)
+    engine.add_listener(server)
+    engine.reset()
+    while True:
+        await asyncio.sleep(tick_ms / 1000)
+        if engine.game_over:
+            engine.reset()
+        else:
+            engine.step()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """命令行入口：serve 运行无界面 AI 对局并广播，view 连接并观看。"""
+    parser = argparse.ArgumentParser(description="贪吃蛇观战服务器")
+    parser.add_argument("command", choices=["serve", "view"])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", dest="path", default=None, help="Unix 套接字路径")
+    parser.add_argument("--cols", type=int, default=30)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--tick-ms", type=int, default=DEFAULT_TICK_MS)
+    args = parser.parse_args(argv)
+
+    async def serve() -> None:
+        server = SpectatorServer(args.host, args.port, path=args.path)
+        await server.start()
+        try:
+            await run_headless_game(server, args.cols, args.rows, args.tick_ms)
+        finally:
+            await server.stop()
+
+    try:
+        if args.command == "serve":
+            asyncio.run(serve())
+        else:
+            asyncio.run(run_viewer(args.host, args.port, args.path))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
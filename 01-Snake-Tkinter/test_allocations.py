@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""稳态 tick 内存分配测试。"""
+
+import random
+import unittest
+
+from benchmarks import endgame_position, measure_tick_allocations
+from bitboard import BitboardEngine
+from endgame import EndgameSolver
+from engine import SnakeEngine
+
+
+class TickAllocationTests(unittest.TestCase):
+    """用 tracemalloc 检查 AI 模式下稳态 tick 不产生持续分配。"""
+
+    def test_steady_tick_does_not_allocate(self):
+        """测试稳态 tick 没有净分配，瞬时分配也保持在很小的范围内。"""
+        engine = SnakeEngine(20, 15, auto_play=True, rng=random.Random(3))
+        result = measure_tick_allocations(engine, ticks=3000, warmup=300)
+
+        self.assertGreater(result["steady_ticks"], 2000)
+        # 只允许大整数装箱等零星分配，不能随 tick 数线性增长
+        self.assertLess(result["net_bytes"], result["steady_ticks"])
+        self.assertLess(result["net_blocks"], 64)
+        # 旧实现每次 BFS 都新建字典和队列，单个 tick 的瞬时分配达数十 KB
+        self.assertLess(result["peak_tick_bytes"], 4096)
+
+    def test_endgame_allocations_are_bounded(self):
+        """测试残局求解器的分配有界：置换表填满后净分配不随 tick 数增长，单个 tick 的瞬时分配有限。"""
+        engine = SnakeEngine(12, 10, auto_play=True, rng=random.Random(0))
+        # 关闭时间上限和交给贪心策略的机制，整个测量窗口都停留在残局搜索中
+        engine.endgame = EndgameSolver(threshold=40, node_budget=500, time_limit_ms=10000.0,
+                                       table_size=256, stall_ticks=10 ** 6)
+        endgame_position(engine, 30, random.Random(0))
+        result = measure_tick_allocations(engine, ticks=200, warmup=60, reset=False)
+
+        self.assertEqual(engine.tick, 260)
+        self.assertTrue(engine.endgame.is_active(engine))
+        self.assertGreater(engine.endgame.searches, 30)
+        self.assertGreater(result["steady_ticks"], 150)
+        self.assertLessEqual(len(engine.endgame.table), 256)
+        # 求解器的缓冲区和置换表都有上限，不能随 tick 数线性增长
+        self.assertLess(result["net_bytes"], 128 * 1024)
+        # 每次搜索复制占据表、新建候选列表，瞬时分配远大于贪心策略的 4 KB
+        self.assertLess(result["peak_tick_bytes"], 256 * 1024)
+
+    def test_measurement_counts_only_steady_ticks(self):
+        """测试吃食物和重开的 tick 不计入统计。"""
+        engine = BitboardEngine(8, 6, auto_play=True, rng=random.Random(1))
+        result = measure_tick_allocations(engine, ticks=200, warmup=0)
+        self.assertLess(result["steady_ticks"], 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""位棋盘测试。"""
+
+import random
+import unittest
+
+from bitboard import Bitboard, BitboardEngine
+from engine import SnakeEngine
+
+
+def _random_blocked(cols, rows, density, seed):
+    """生成随机障碍物集合。"""
+    rng = random.Random(seed)
+    return {(x, y) for y in range(rows) for x in range(cols) if rng.random() < density}
+
+
+class BitboardTests(unittest.TestCase):
+    """位棋盘基本操作测试。"""
+
+    def test_free_count(self):
+        """测试空闲格子计数。"""
+        board = Bitboard.from_cells(7, 5, {(0, 0), (6, 4), (3, 2)})
+        self.assertEqual(board.free_count(), 7 * 5 - 3)
+
+    def test_collision(self):
+        """测试碰撞检测。"""
+        board = Bitboard(4, 4)
+        board.occupy(2, 3)
+        self.assertTrue(board.is_occupied(2, 3))
+        self.assertFalse(board.is_occupied(3, 2))
+        board.release(2, 3)
+        self.assertFalse(board.is_occupied(2, 3))
+
+    def test_no_wrap_between_rows(self):
+        """测试左右扩展不会从行尾卷到下一行行首。"""
+        board = Bitboard(5, 3)
+        # 竖墙把第 4 列与其余格子隔开
+        for y in range(3):
+            board.occupy(3, y)
+        self.assertEqual(board.region_size(4, 0), 3)
+        self.assertEqual(board.region_size(0, 1), 9)
+
+    def test_distance_matches_tuple_bfs(self):
+        """测试最短路长度与元组实现的 BFS 一致。"""
+        engine = SnakeEngine(16, 12)
+        for seed in range(5):
+            blocked = _random_blocked(16, 12, 0.25, seed)
+            board = Bitboard.from_cells(16, 12, blocked)
+            start = (0, 0)
+            for goal in [(15, 11), (8, 6), (3, 9)]:
+                blocked.discard(start)
+                board.release(*start)
+                expected = engine.bfs(start, goal, blocked)
+                path = board.shortest_path(start, goal)
+                if expected is None:
+                    self.assertIsNone(path)
+                    continue
+                self.assertEqual(len(path), len(expected))
+                self.assertEqual(path[0], start)
+                self.assertEqual(path[-1], goal)
+                for (ax, ay), (bx, by) in zip(path, path[1:]):
+                    self.assertEqual(abs(ax - bx) + abs(ay - by), 1)
+                    self.assertNotIn((bx, by), blocked)
+
+    def test_random_free_cell(self):
+        """测试随机空闲格子总是空闲且能覆盖所有空闲格子。"""
+        blocked = _random_blocked(6, 4, 0.5, 3)
+        board = Bitboard.from_cells(6, 4, blocked)
+        rng = random.Random(0)
+        seen = set()
+        for _ in range(500):
+            cell = board.random_free_cell(rng)
+            self.assertNotIn(cell, blocked)
+            seen.add(cell)
+        self.assertEqual(len(seen), board.free_count())
+
+    def test_random_free_cell_full_board(self):
+        """测试棋盘填满时返回 None。"""
+        board = Bitboard(3, 3)
+        board.occupied = board.board_mask
+        self.assertIsNone(board.random_free_cell(random.Random(0)))
+
+
+class BitboardEngineTests(unittest.TestCase):
+    """位棋盘引擎测试。"""
+
+    def test_board_follows_snake(self):
+        """测试 AI 对局中位棋盘与蛇身始终一致。"""
+        engine = BitboardEngine(15, 10, auto_play=True, rng=random.Random(4))
+        engine.reset()
+        for _ in range(200):
+            if engine.game_over:
+                break
+            engine.step()
+            self.assertEqual(engine.board.occupied, engine.board.mask_of(set(engine.snake)))
+            if engine.food is not None:
+                self.assertNotIn(engine.food, engine.snake)
+        self.assertGreater(engine.score, 0)
+
+    def test_ai_matches_snake_engine(self):
+        """测试位并行找最近候选与逐格 BFS 选择相同，两种引擎走出同一局。"""
+        for seed in range(3):
+            plain = SnakeEngine(20, 15, auto_play=True, rng=random.Random(seed))
+            bits = BitboardEngine(20, 15, auto_play=True, rng=random.Random(seed))
+            plain.reset()
+            bits.reset()
+            for _ in range(1500):
+                if plain.game_over:
+                    break
+                plain.step()
+                bits.step()
+                self.assertEqual(bits.snake, plain.snake)
+            self.assertEqual(bits.game_over, plain.game_over)
+
+
+if __name__ == "__main__":
+    unittest.main()
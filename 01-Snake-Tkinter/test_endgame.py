@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""残局求解器测试。"""
+
+import random
+import unittest
+
+from benchmarks import endgame_position, random_hamiltonian_cycle
+from endgame import ENDGAME_FIRST_DEPTH, EndgameSolver
+from engine import SnakeEngine
+
+
+def _play(engine, ticks):
+    """推进引擎直到游戏结束或达到 tick 上限。"""
+    while not engine.game_over and engine.tick < ticks:
+        engine.step()
+
+
+class EndgameSolverTests(unittest.TestCase):
+    """测试残局模式的启用条件、搜索结果与统计。"""
+
+    def test_hamiltonian_cycle_covers_board(self):
+        """测试生成的随机回路经过每个格子一次且首尾相邻。"""
+        path = random_hamiltonian_cycle(8, 6, random.Random(0))
+        self.assertEqual(len(set(path)), 48)
+        for (ax, ay), (bx, by) in zip(path, path[1:] + path[:1]):
+            self.assertEqual(abs(ax - bx) + abs(ay - by), 1)
+
+    def test_inactive_above_threshold(self):
+        """测试空闲格子多于阈值时不搜索，关闭后不创建求解器。"""
+        engine = SnakeEngine(12, 10, auto_play=True, rng=random.Random(0), endgame_threshold=10)
+        engine.reset()
+        _play(engine, 50)
+        self.assertEqual(engine.endgame.searches, 0)
+        self.assertIsNone(SnakeEngine(12, 10, endgame_threshold=None).endgame)
+
+    def test_incremental_hash_matches_full_hash(self):
+        """测试增量更新的 Zobrist 哈希与从头计算一致，撤销后恢复原值。"""
+        engine = SnakeEngine(8, 6, auto_play=True, rng=random.Random(1))
+        endgame_position(engine, 6, random.Random(1))
+        solver = engine.endgame
+        solver.node_budget = 0
+        solver.choose(engine)
+
+        original = solver._hash
+        rng = random.Random(2)
+        pushed = []
+        for _ in range(20):
+            head = solver._body[-1]
+            moves = [(d, table[head]) for d, table in enumerate(solver._tables)
+                     if table[head] >= 0 and not solver._occupied[table[head]]]
+            if not moves:
+                break
+            d, target = rng.choice(moves)
+            pushed.append(solver._push(d, target))
+            self.assertEqual(solver._hash, solver._full_hash())
+        while pushed:
+            solver._pop(pushed.pop())
+        self.assertEqual(solver._hash, original)
+
+    def test_depth_limited_hits_do_not_prove_unsolvable(self):
+        """测试命中“k 步内无解”的记录后仍会加深搜索，不会把根状态误记为永远无解。"""
+        for seed in range(4):
+            engine = SnakeEngine(8, 6, auto_play=True, rng=random.Random(seed))
+            endgame_position(engine, 10, random.Random(seed))
+            solver = engine.endgame
+            solver.node_budget = 10 ** 6
+            solver._load(engine)
+            # 所有子状态都记为“首轮深度内无解”
+            head = solver._body[-1]
+            for d, table in enumerate(solver._tables):
+                target = table[head]
+                if target >= 0 and not solver._occupied[target] and target != solver._food:
+                    tail = solver._push(d, target)
+                    solver.table[solver._hash] = ENDGAME_FIRST_DEPTH - 1
+                    solver._pop(tail)
+            solver.choose(engine)
+
+            fresh = SnakeEngine(8, 6, auto_play=True, rng=random.Random(seed))
+            endgame_position(fresh, 10, random.Random(seed))
+            fresh.endgame.node_budget = 10 ** 6
+            fresh.endgame.choose(fresh)
+            self.assertEqual(solver.solved, fresh.endgame.solved)
+
+    def test_beats_greedy_on_small_boards(self):
+        """测试同样的残局下求解器能填满棋盘，剩下的空格也比贪心策略少得多。"""
+        left = {}
+        filled = 0
+        for threshold in (40, None):
+            left[threshold] = 0
+            for seed in range(6):
+                engine = SnakeEngine(8, 6, auto_play=True, rng=random.Random(seed),
+                                     endgame_threshold=threshold)
+                endgame_position(engine, 10, random.Random(seed))
+                _play(engine, 3000)
+                left[threshold] += 48 - len(engine.snake)
+                if threshold is not None:
+                    filled += len(engine.snake) == 48
+        self.assertGreater(filled, 0)
+        self.assertLess(2 * left[40], left[None])
+
+    def test_seeded_games_are_reproducible(self):
+        """测试同一种子的残局对局走法完全相同，与机器速度无关。"""
+        snakes = []
+        for _ in range(2):
+            engine = SnakeEngine(12, 10, auto_play=True, rng=random.Random(7))
+            engine.endgame.node_budget = 300
+            endgame_position(engine, 30, random.Random(7))
+            _play(engine, 600)
+            snakes.append((engine.snake, engine.tick, engine.endgame.nodes))
+        self.assertEqual(snakes[0], snakes[1])
+
+    def test_gives_up_after_stalling(self):
+        """测试求解器长时间没吃到食物时交给贪心策略，对局不会无限绕圈。"""
+        engine = SnakeEngine(8, 6, auto_play=True, rng=random.Random(3))
+        # 节点预算为 0 时搜索找不到方案，只会安全地绕圈
+        engine.endgame = EndgameSolver(threshold=40, node_budget=0, stall_ticks=30)
+        endgame_position(engine, 10, random.Random(3))
+        length = len(engine.snake)
+        last_eat = 0
+        longest = 0
+        while not engine.game_over and engine.tick < 1000:
+            engine.step()
+            if len(engine.snake) != length:
+                length = len(engine.snake)
+                last_eat = engine.tick
+            longest = max(longest, engine.tick - last_eat)
+        # 不设上限时这一局会一直绕圈到 1000 个 tick
+        self.assertTrue(engine.game_over)
+        self.assertLess(longest, 100)
+        self.assertGreater(engine.endgame.giveups, 0)
+
+    def test_table_is_bounded(self):
+        """测试置换表不超过容量。"""
+        engine = SnakeEngine(8, 6, auto_play=True, rng=random.Random(4))
+        engine.endgame = EndgameSolver(threshold=40, table_size=16)
+        endgame_position(engine, 12, random.Random(4))
+        _play(engine, 2000)
+        self.assertGreater(engine.endgame.lookups, 0)
+        self.assertLessEqual(len(engine.endgame.table), 16)
+
+    def test_large_endgame_within_budget(self):
+        """测试 20x20 残局每次搜索都不超过节点预算，且能吃到食物。"""
+        engine = SnakeEngine(20, 20, auto_play=True, rng=random.Random(5))
+        solver = engine.endgame
+        solver.node_budget = 1000
+        endgame_position(engine, 20, random.Random(5))
+        length = len(engine.snake)
+        _play(engine, 400)
+
+        self.assertGreater(len(engine.snake), length)
+        self.assertGreater(solver.solved, 0)
+        self.assertLessEqual(solver.max_search_nodes, solver.node_budget + 1)
+        stats = solver.stats()
+        self.assertGreater(stats["nodes_per_sec"], 0)
+        self.assertGreater(stats["lookups"], 0)
+        self.assertGreaterEqual(stats["hit_rate"], 0.0)
+        self.assertLessEqual(stats["hit_rate"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""无界面帧导出测试。"""
+
+import io
+import os
+import random
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+from colors import COLOR_FOOD, COLOR_SNAKE_HEAD, to_rgb
+from engine import SnakeEngine
+from export import (
+    FrameRenderer,
+    GifWriter,
+    PngSequenceWriter,
+    encode_indexed_png,
+    encode_png,
+    export_game,
+    export_palette,
+    lzw_encode,
+    PALETTE_BODY,
+)
+from level import Level
+
+
+def _decode_png(data):
+    """解码本模块写出的 PNG（过滤类型 0/2），返回 (宽, 高, 每像素字节数, 像素, 调色板)。"""
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos = 8
+    idat = b""
+    palette = None
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        assert struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(kind + body)
+        if kind == b"IHDR":
+            width, height, _, color_type = struct.unpack(">IIBB", body[:10])
+        elif kind == b"PLTE":
+            palette = [tuple(body[i:i + 3]) for i in range(0, len(body), 3)]
+        elif kind == b"IDAT":
+            idat += body
+        pos += 12 + length
+    channels = 3 if color_type == 2 else 1
+    raw = zlib.decompress(idat)
+    stride = width * channels
+    pixels = bytearray()
+    previous = bytes(stride)
+    for y in range(height):
+        kind = raw[y * (stride + 1)]
+        row = raw[y * (stride + 1) + 1:(y + 1) * (stride + 1)]
+        if kind == 2:
+            row = bytes((a + b) & 0xFF for a, b in zip(row, previous))
+        pixels += row
+        previous = row
+    return width, height, channels, bytes(pixels), palette
+
+
+def _lzw_decode(data, min_code_size):
+    """标准 GIF LZW 解码，作为对照。"""
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+    pos = 0
+    bits = 0
+    buffer = 0
+    code_size = min_code_size + 1
+    table = []
+    previous = None
+    out = bytearray()
+    while True:
+        while bits < code_size:
+            buffer |= data[pos] << bits
+            pos += 1
+            bits += 8
+        code = buffer & ((1 << code_size) - 1)
+        buffer >>= code_size
+        bits -= code_size
+        if code == clear_code:
+            table = [bytes([i]) for i in range(clear_code)] + [b"", b""]
+            code_size = min_code_size + 1
+            previous = None
+            continue
+        if code == end_code:
+            return bytes(out)
+        if code < len(table):
+            entry = table[code]
+        else:
+            entry = previous + previous[:1]
+        out += entry
+        if previous is not None and len(table) < 4096:
+            table.append(previous + entry[:1])
+            if len(table) == 1 << code_size and code_size < 12:
+                code_size += 1
+        previous = entry
+
+
+def _gif_frames(data):
+    """解析 GIF，依次返回每帧合成后的完整调色板下标画面。"""
+    width, height, flags = struct.unpack("<HHB", data[6:11])
+    pos = 13 + 3 * (2 << (flags & 7))
+    canvas = bytearray(width * height)
+    frames = []
+    while data[pos] != 0x3B:
+        if data[pos] == 0x21:
+            pos += 2
+            while data[pos]:
+                pos += data[pos] + 1
+            pos += 1
+            continue
+        left, top, w, h, _ = struct.unpack("<HHHHB", data[pos + 1:pos + 10])
+        min_code_size = data[pos + 10]
+        pos += 11
+        blocks = bytearray()
+        while data[pos]:
+            blocks += data[pos + 1:pos + 1 + data[pos]]
+            pos += data[pos] + 1
+        pos += 1
+        pixels = _lzw_decode(bytes(blocks), min_code_size)
+        for y in range(h):
+            start = (top + y) * width + left
+            canvas[start:start + w] = pixels[y * w:(y + 1) * w]
+        frames.append(bytes(canvas))
+    return frames
+
+
+class FrameRendererTests(unittest.TestCase):
+    """渲染器测试。"""
+
+    def setUp(self):
+        """创建临时距离缓存目录。"""
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """删除临时距离缓存目录。"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_colors_match_tk_constants(self):
+        """测试像素颜色与界面使用的颜色常量一致。"""
+        renderer = FrameRenderer(5, 4, cell_size=3)
+        renderer.draw_state([(0, 0), (1, 0)], (4, 3))
+        head = (1 * 3) * 3
+        self.assertEqual(tuple(renderer.rgb[head:head + 3]), to_rgb(COLOR_SNAKE_HEAD))
+        food = ((3 * 3 + 2) * renderer.width + 4 * 3 + 2) * 3
+        self.assertEqual(tuple(renderer.rgb[food:food + 3]), to_rgb(COLOR_FOOD))
+
+    def test_incremental_matches_full_redraw(self):
+        """测试逐 tick 只画变化格子的结果与每帧整帧重画一致，脏矩形覆盖所有变化。"""
+        level = Level.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "arena.txt"))
+        engine = SnakeEngine(level.cols, level.rows, auto_play=True, rng=random.Random(3), level=level,
+                             distance_cache_dir=self.cache_dir)
+        engine.distances = None
+        renderer = FrameRenderer(level.cols, level.rows, cell_size=2, level=level)
+        engine.add_listener(renderer)
+        engine.reset()
+        renderer.take_dirty()
+        for _ in range(300):
+            if engine.game_over:
+                break
+            before = bytes(renderer.indexed)
+            engine.step()
+            expected = FrameRenderer(level.cols, level.rows, cell_size=2, level=level)
+            expected.draw_state(engine.snake, engine.food)
+            self.assertEqual(renderer.rgb, expected.rgb)
+            rect = renderer.take_dirty()
+            left, top, width, height = rect
+            for index, (old, new) in enumerate(zip(before, renderer.indexed)):
+                if old != new:
+                    x, y = index % renderer.width, index // renderer.width
+                    self.assertTrue(left <= x < left + width and top <= y < top + height)
+        self.assertGreater(engine.score, 0)
+
+    def test_unchanged_cells_are_not_dirty(self):
+        """测试画成相同颜色不产生脏区域。"""
+        renderer = FrameRenderer(4, 4)
+        renderer.draw_state([(1, 1)], None)
+        renderer.take_dirty()
+        renderer.paint(5, renderer._cells[5])
+        self.assertIsNone(renderer.take_dirty())
+        renderer.paint(0, PALETTE_BODY)
+        self.assertEqual(renderer.take_dirty(), (0, 0, renderer.cell_size, renderer.cell_size))
+
+
+class EncoderTests(unittest.TestCase):
+    """PNG 与 GIF 编码测试。"""
+
+    def test_png_round_trip(self):
+        """测试真彩色与调色板 PNG 都能还原出相同像素。"""
+        renderer = FrameRenderer(6, 5, cell_size=4)
+        renderer.draw_state([(0, 0), (1, 0), (1, 1)], (5, 4))
+        width, height, channels, pixels, _ = _decode_png(encode_png(renderer.width, renderer.height, renderer.rgb))
+        self.assertEqual((width, height, channels), (24, 20, 3))
+        self.assertEqual(pixels, bytes(renderer.rgb))
+        _, _, channels, pixels, palette = _decode_png(
+            encode_indexed_png(renderer.width, renderer.height, renderer.indexed, renderer.palette))
+        self.assertEqual(channels, 1)
+        self.assertEqual(b"".join(bytes(palette[i]) for i in pixels), bytes(renderer.rgb))
+
+    def test_lzw_round_trip(self):
+        """测试 LZW 编码在长色段、随机噪声和码表写满重置时都能正确解码。"""
+        rng = random.Random(0)
+        samples = [
+            b"",
+            b"\x01",
+            bytes(5000),
+            bytes([rng.randrange(8) for _ in range(20000)]),
+            b"".join(bytes([rng.randrange(4)]) * rng.randrange(1, 300) for _ in range(400)),
+        ]
+        for data in samples:
+            self.assertEqual(_lzw_decode(lzw_encode(data, 3), 3), data)
+
+    def test_gif_frames_match_renderer(self):
+        """测试 GIF 每帧合成后的画面与渲染器一致，无变化的 tick 合并进上一帧。"""
+        engine = SnakeEngine(12, 8, auto_play=True, rng=random.Random(2))
+        renderer = FrameRenderer(12, 8, cell_size=3)
+        engine.add_listener(renderer)
+        stream = io.BytesIO()
+        writer = GifWriter(stream, renderer.width, renderer.height, export_palette())
+        engine.reset()
+        expected = []
+        for _ in range(120):
+            writer.write(renderer)
+            if not expected or expected[-1] != bytes(renderer.indexed):
+                expected.append(bytes(renderer.indexed))
+            if engine.game_over:
+                break
+            engine.step()
+        writer.close()
+        self.assertEqual(_gif_frames(stream.getvalue()), expected)
+
+
+class ExportGameTests(unittest.TestCase):
+    """导出整局测试。"""
+
+    def setUp(self):
+        """创建临时目录。"""
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """删除临时目录。"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_png_sequence(self):
+        """测试每个 tick 写出一张 PNG。"""
+        engine = SnakeEngine(10, 8, auto_play=True, rng=random.Random(1))
+        writer = PngSequenceWriter(self.directory)
+        frames = export_game(engine, writer, ticks=20, cell_size=2)
+        writer.close()
+        self.assertEqual(frames, 21)
+        files = sorted(os.listdir(self.directory))
+        self.assertEqual(len(files), 21)
+        with open(os.path.join(self.directory, files[-1]), "rb") as f:
+            width, height, _, _, _ = _decode_png(f.read())
+        self.assertEqual((width, height), (20, 16))
+        self.assertEqual(engine.listeners, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
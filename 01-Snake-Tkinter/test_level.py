@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""关卡地图与距离场测试。"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from collections import deque
+
+from bitboard import BitboardEngine
+from engine import SnakeEngine, DIRECTION_LEFT
+from level import DistanceField, Level, UNREACHABLE, cache_path, pending_build
+
+LEVEL_TEXT = """\
+; 测试关卡：中间一道竖墙，传送门 a 连通两侧
+##########
+#........#
+#a...#..a#
+#....#...#
+#..S.#...#
+##########
+"""
+
+
+def _naive_distance(level, start, goal):
+    """按关卡移动规则逐格 BFS，作为对照。"""
+    seen = {start: 0}
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
+        if current == goal:
+            return seen[current]
+        for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+            x, y = current[0] + dx, current[1] + dy
+            if (x, y) in level.portals:
+                px, py = level.portals[(x, y)]
+                x, y = px + dx, py + dy
+            if not (0 <= x < level.cols and 0 <= y < level.rows) or level.is_blocked(x, y):
+                continue
+            if (x, y) not in seen:
+                seen[(x, y)] = seen[current] + 1
+                queue.append((x, y))
+    return UNREACHABLE
+
+
+class LevelTests(unittest.TestCase):
+    """关卡解析与移动规则测试。"""
+
+    def setUp(self):
+        """创建临时缓存目录，避免写入用户的距离缓存。"""
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """删除临时缓存目录。"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_parse(self):
+        """测试解析墙壁、传送门和起始位置。"""
+        level = Level.from_text(LEVEL_TEXT)
+        self.assertEqual((level.cols, level.rows), (10, 6))
+        self.assertIn((5, 3), level.walls)
+        self.assertEqual(level.portals[(1, 2)], (8, 2))
+        self.assertEqual(level.start, (3, 4))
+        self.assertEqual(Level.from_text(level.to_text()).hash, level.hash)
+
+    def test_invalid_level(self):
+        """测试行宽不一致、传送门不成对和起始位置被挡住时报错。"""
+        with self.assertRaises(ValueError):
+            Level.from_text("###\n##\n")
+        with self.assertRaises(ValueError):
+            Level.from_text("a....\n.....\n")
+        with self.assertRaises(ValueError):
+            Level.from_text("....\n.#S.\n")
+
+    def test_hash_ignores_start(self):
+        """测试起始位置不影响关卡哈希，墙壁变化会改变哈希。"""
+        level = Level.from_text(LEVEL_TEXT)
+        moved = Level.from_text(LEVEL_TEXT.replace("#..S.#", "#...S#"))
+        walled = Level.from_text(LEVEL_TEXT.replace("#........#", "#..#.....#"))
+        self.assertEqual(level.hash, moved.hash)
+        self.assertNotEqual(level.hash, walled.hash)
+
+    def test_portal_moves_through(self):
+        """测试蛇头进入传送门后从配对传送门沿原方向走出。"""
+        engine = SnakeEngine(10, 6, level=Level.from_text(LEVEL_TEXT), distance_cache_dir=self.cache_dir)
+        engine.distances = None
+        engine.snake = [(4, 1), (3, 1), (3, 2), (2, 2)]
+        engine.direction = DIRECTION_LEFT
+        engine.pending_direction = DIRECTION_LEFT
+        engine.food = (6, 4)
+        engine.step()
+        self.assertFalse(engine.game_over)
+        self.assertEqual(engine.snake[-1], (7, 2))
+
+    def test_wall_collision_ends_game(self):
+        """测试撞墙时游戏结束。"""
+        engine = SnakeEngine(10, 6, level=Level.from_text(LEVEL_TEXT), distance_cache_dir=self.cache_dir)
+        engine.reset()
+        engine.snake = [(2, 3), (3, 3), (4, 3)]
+        engine.step()
+        self.assertTrue(engine.game_over)
+
+    def test_food_avoids_walls_and_portals(self):
+        """测试食物不会放在墙壁或传送门上。"""
+        level = Level.from_text(LEVEL_TEXT)
+        engine = SnakeEngine(10, 6, rng=random.Random(0), level=level, distance_cache_dir=self.cache_dir)
+        engine.reset()
+        for _ in range(200):
+            engine.place_food()
+            self.assertFalse(level.is_blocked(*engine.food))
+            self.assertNotIn(engine.food, engine.snake)
+
+
+class DistanceFieldTests(unittest.TestCase):
+    """距离场计算与磁盘缓存测试。"""
+
+    def setUp(self):
+        """创建临时缓存目录。"""
+        self.cache_dir = tempfile.mkdtemp()
+        self.level = Level.from_text(LEVEL_TEXT)
+
+    def tearDown(self):
+        """删除临时缓存目录。"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def make_engine(self, engine_class=SnakeEngine, **kwargs):
+        """创建使用临时缓存目录的引擎。"""
+        return engine_class(self.level.cols, self.level.rows, level=self.level,
+                            distance_cache_dir=self.cache_dir, **kwargs)
+
+    def test_distances_match_bfs(self):
+        """测试距离表与逐格 BFS 一致，并且穿过传送门。"""
+        engine = self.make_engine()
+        cols = self.level.cols
+        floor = [(x, y) for y in range(self.level.rows) for x in range(cols)
+                 if not self.level.is_blocked(x, y)]
+        for a in floor:
+            for b in floor:
+                self.assertEqual(
+                    engine.distances.distance(a[1] * cols + a[0], b[1] * cols + b[0]),
+                    _naive_distance(self.level, a, b),
+                )
+        # 从 (2, 2) 向左进入传送门，出现在 (7, 2)
+        self.assertEqual(engine.distances.distance(2 * cols + 2, 2 * cols + 7), 1)
+
+    def test_second_load_uses_cache(self):
+        """测试第二次加载直接映射缓存文件，结果一致。"""
+        first = self.make_engine()
+        self.assertFalse(first.distances.from_cache)
+        self.assertTrue(os.path.exists(cache_path(self.level, self.cache_dir)))
+        second = self.make_engine()
+        self.assertTrue(second.distances.from_cache)
+        self.assertEqual(list(first.distances.table), list(second.distances.table))
+        first.distances.close()
+        second.distances.close()
+
+    def test_corrupt_cache_is_rebuilt(self):
+        """测试缓存文件损坏时重新计算。"""
+        engine = self.make_engine()
+        engine.distances.close()
+        path = cache_path(self.level, self.cache_dir)
+        with open(path, "r+b") as f:
+            f.write(b"XXXX")
+        field = DistanceField.load_or_build(self.level, engine._neighbor_table, self.cache_dir)
+        self.assertFalse(field.from_cache)
+        field.close()
+
+    def test_large_level_builds_in_background(self):
+        """测试超过同步构建上限时先返回 None，后台写好缓存后下次直接映射。"""
+        engine = self.make_engine()
+        engine.distances.close()
+        os.remove(cache_path(self.level, self.cache_dir))
+        neighbors = engine._neighbor_table
+        self.assertIsNone(DistanceField.load_or_build(self.level, neighbors, self.cache_dir, build_limit=10))
+        builder = pending_build(self.level, self.cache_dir)
+        if builder is not None:
+            builder.join()
+        field = DistanceField.load_or_build(self.level, neighbors, self.cache_dir, build_limit=10)
+        self.assertTrue(field.from_cache)
+        field.close()
+
+    def test_oversized_level_plays_without_field(self):
+        """测试超过距离表上限的关卡不使用距离场，照常运行。"""
+        level = Level.empty(70, 70)
+        engine = SnakeEngine(70, 70, auto_play=True, rng=random.Random(0), level=level,
+                             distance_cache_dir=self.cache_dir)
+        self.assertIsNone(engine.distances)
+        self.assertIsNone(pending_build(level, self.cache_dir))
+        engine.reset()
+        for _ in range(50):
+            engine.step()
+        self.assertFalse(engine.game_over)
+
+    def test_bfs_uses_field(self):
+        """测试 bfs 的结果与无距离场时长度一致，且不可达时返回 None。"""
+        engine = self.make_engine()
+        plain = self.make_engine()
+        plain.distances = None
+        blocked = {(3, 1), (3, 2), (3, 3)}
+        for goal in [(7, 4), (6, 1), (1, 1), (3, 4)]:
+            expected = plain.bfs((2, 4), goal, blocked)
+            path = engine.bfs((2, 4), goal, blocked)
+            if expected is None:
+                self.assertIsNone(path)
+            else:
+                self.assertEqual(len(path), len(expected))
+                self.assertEqual((path[0], path[-1]), ((2, 4), goal))
+
+    def test_ai_matches_plain_bfs(self):
+        """测试使用距离场的 AI 与纯 BFS 的 AI 做出完全相同的决策。"""
+        level = Level.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "arena.txt"))
+        engines = []
+        for use_field in (True, False):
+            engine = SnakeEngine(level.cols, level.rows, auto_play=True, rng=random.Random(5),
+                                 level=level, distance_cache_dir=self.cache_dir)
+            if not use_field:
+                engine.distances = None
+            engine.reset()
+            engines.append(engine)
+        for _ in range(1500):
+            for engine in engines:
+                engine.step()
+            self.assertEqual(engines[0].snake, engines[1].snake)
+            if engines[0].game_over:
+                break
+        self.assertGreater(engines[0].score, 0)
+
+    def test_bitboard_engine_with_level(self):
+        """测试位棋盘引擎把墙壁计入占据并能在关卡上运行。"""
+        engine = self.make_engine(BitboardEngine, auto_play=True, rng=random.Random(1))
+        engine.reset()
+        for _ in range(100):
+            if engine.game_over:
+                break
+            engine.step()
+            self.assertFalse(self.level.is_blocked(*engine.snake[-1]))
+            self.assertFalse(self.level.is_blocked(*engine.food))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""空闲区域追踪器测试。"""
+
+import random
+import unittest
+from collections import deque
+
+from engine import SnakeEngine, DIRECTION_DOWN, DIRECTION_LEFT
+from region import RegionTracker
+
+
+def _naive_region_size(cols, rows, occupied, x, y):
+    """朴素泛洪计算区域大小，作为对照。"""
+    if (x, y) in occupied:
+        return 0
+    seen = {(x, y)}
+    queue = deque([(x, y)])
+    while queue:
+        cx, cy = queue.popleft()
+        for nx, ny in ((cx, cy - 1), (cx, cy + 1), (cx - 1, cy), (cx + 1, cy)):
+            if 0 <= nx < cols and 0 <= ny < rows and (nx, ny) not in occupied and (nx, ny) not in seen:
+                seen.add((nx, ny))
+                queue.append((nx, ny))
+    return len(seen)
+
+
+class RegionTrackerTests(unittest.TestCase):
+    """区域追踪器正确性测试。"""
+
+    def assert_matches_naive(self, tracker, occupied):
+        """逐格比对追踪器与朴素泛洪的结果。"""
+        for y in range(tracker.rows):
+            for x in range(tracker.cols):
+                self.assertEqual(
+                    tracker.region_size(x, y),
+                    _naive_region_size(tracker.cols, tracker.rows, occupied, x, y),
+                    f"格子 ({x}, {y}) 区域大小不一致",
+                )
+
+    def test_empty_board_is_one_region(self):
+        """测试空棋盘是一个完整区域。"""
+        tracker = RegionTracker(6, 4)
+        self.assertEqual(tracker.region_size(0, 0), 24)
+        self.assertEqual(tracker.region_size(5, 3), 24)
+
+    def test_wall_splits_board(self):
+        """测试一道竖墙把棋盘切成两半。"""
+        tracker = RegionTracker(5, 4)
+        for y in range(4):
+            tracker.occupy(2, y)
+        self.assertEqual(tracker.region_size(0, 0), 8)
+        self.assertEqual(tracker.region_size(4, 3), 8)
+        self.assertEqual(tracker.region_size(2, 1), 0)
+
+    def test_release_merges_regions(self):
+        """测试释放格子后两个区域合并。"""
+        tracker = RegionTracker(5, 4)
+        for y in range(4):
+            tracker.occupy(2, y)
+        tracker.release(2, 1)
+        self.assertEqual(tracker.region_size(0, 0), 17)
+
+    def test_large_split_beyond_local_budget(self):
+        """测试超出局部搜索上限的大区域被切开时仍然正确。"""
+        tracker = RegionTracker(20, 20, local_budget=8)
+        occupied = set()
+        for y in range(20):
+            tracker.occupy(10, y)
+            occupied.add((10, y))
+        self.assert_matches_naive(tracker, occupied)
+
+    def test_random_snake_walk_matches_flood_fill(self):
+        """测试随机蛇形移动时结果始终与泛洪一致。"""
+        rng = random.Random(7)
+        cols, rows = 9, 7
+        tracker = RegionTracker(cols, rows, local_budget=6)
+        body = deque([(0, 0)])
+        occupied = {(0, 0)}
+        tracker.occupy(0, 0)
+        for _ in range(400):
+            hx, hy = body[-1]
+            options = [
+                (nx, ny) for nx, ny in ((hx, hy - 1), (hx, hy + 1), (hx - 1, hy), (hx + 1, hy))
+                if 0 <= nx < cols and 0 <= ny < rows and (nx, ny) not in occupied
+            ]
+            if not options:
+                break
+            head = rng.choice(options)
+            body.append(head)
+            occupied.add(head)
+            tracker.occupy(*head)
+            if len(body) > 15 and rng.random() < 0.9:
+                tail = body.popleft()
+                occupied.discard(tail)
+                tracker.release(*tail)
+            self.assert_matches_naive(tracker, occupied)
+
+    def test_reset_rebuilds_from_occupied(self):
+        """测试 reset 按给定占据格子重建。"""
+        tracker = RegionTracker(4, 4)
+        occupied = {(1, 0), (1, 1), (1, 2), (1, 3)}
+        tracker.reset(occupied)
+        self.assertEqual(tracker.occupied_count, 4)
+        self.assert_matches_naive(tracker, occupied)
+
+
+class EngineRegionTests(unittest.TestCase):
+    """引擎中区域追踪器的集成测试。"""
+
+    def test_tracker_follows_engine(self):
+        """测试引擎运行时追踪器与蛇身保持同步。"""
+        engine = SnakeEngine(12, 10, auto_play=True, rng=random.Random(2))
+        engine.reset()
+        for _ in range(150):
+            if engine.game_over:
+                break
+            engine.step()
+            occupied = set(engine.snake)
+            self.assertEqual(engine.regions.occupied_count, len(engine.snake))
+            fx, fy = engine.food
+            self.assertEqual(
+                engine.regions.region_size(fx, fy),
+                _naive_region_size(engine.cols, engine.rows, occupied, fx, fy),
+            )
+
+    def test_ai_avoids_dead_end_pocket(self):
+        """测试 AI 不会为了食物钻进容不下蛇身的小口袋。"""
+        engine = SnakeEngine(10, 10)
+        # 蛇身与左上角的墙围出 6 格口袋 (0..1, 0..2)，蛇头 (0, 3) 正在口袋入口
+        engine.snake = [(5, 0), (4, 0), (3, 0), (2, 0), (2, 1), (2, 2), (2, 3), (1, 3), (0, 3)]
+        engine.direction = DIRECTION_LEFT
+        engine.food = (0, 0)
+
+        direction = engine.get_ai_direction()
+
+        # 口袋只有 6 格，容不下长度为 9 的蛇，应向下走开阔区域
+        self.assertEqual(direction, DIRECTION_DOWN)
+
+
+if __name__ == "__main__":
+    unittest.main()
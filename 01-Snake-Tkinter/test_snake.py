@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 """贪吃蛇游戏逻辑单元测试。"""
 
+import time
 import unittest
 import tkinter as tk
+from engine import INPUT_QUEUE_SIZE
 from snake import SnakeGame, DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT
 
 
@@ -111,8 +113,8 @@ class SnakeGameTests(unittest.TestCase):
 
         self.assertEqual(self.game.pending_direction, DIRECTION_LEFT)
 
-    def test_only_one_direction_change_per_tick(self):
-        """测试每个 tick 只能改变一次方向（防止快速按键导致自杀）。"""
+    def test_reversal_of_queued_direction_rejected(self):
+        """测试相对已排队方向的反向输入被拒绝（防止快速按键导致自杀）。"""
         self.game.init_game()
         self.game.direction = DIRECTION_RIGHT
 
@@ -122,6 +124,45 @@ class SnakeGameTests(unittest.TestCase):
 
         # 应该只保留第一个有效方向
         self.assertEqual(self.game.pending_direction, DIRECTION_UP)
+        self.assertEqual(len(self.game.input_queue), 1)
+
+    def test_double_tap_is_queued(self):
+        """测试一个 tick 内的连续两次转向都会生效，每个 tick 消费一次。"""
+        self.game.init_game()
+        self.game.direction = DIRECTION_RIGHT
+
+        self.game.change_direction(DIRECTION_UP)
+        self.game.change_direction(DIRECTION_LEFT)
+
+        self.game.move()
+        self.assertEqual(self.game.direction, DIRECTION_UP)
+        self.assertEqual(self.game.pending_direction, DIRECTION_LEFT)
+
+        self.game.move()
+        self.assertEqual(self.game.direction, DIRECTION_LEFT)
+        self.assertEqual(len(self.game.input_queue), 0)
+
+    def test_input_queue_is_bounded(self):
+        """测试输入队列有容量上限。"""
+        self.game.init_game()
+        self.game.direction = DIRECTION_RIGHT
+
+        for direction in [DIRECTION_UP, DIRECTION_LEFT, DIRECTION_DOWN, DIRECTION_RIGHT, DIRECTION_UP]:
+            self.game.change_direction(direction)
+
+        self.assertEqual(len(self.game.input_queue), INPUT_QUEUE_SIZE)
+
+    def test_input_latency_recorded(self):
+        """测试输入到画面刷新的延迟被记录。"""
+        self.game.init_game()
+        self.game.direction = DIRECTION_RIGHT
+
+        self.game.change_direction(DIRECTION_UP, timestamp=time.perf_counter() - 0.05)
+        self.game.move()
+
+        stats = self.game.input_latency_stats()
+        self.assertEqual(stats["count"], 1)
+        self.assertGreaterEqual(stats["last_ms"], 50)
 
     def test_bfs_finds_path(self):
         """测试 BFS 找到路径。"""
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""观战服务器协议与广播测试。"""
+
+import asyncio
+import random
+import unittest
+
+from engine import SnakeEngine
+from spectator import (
+    BoardMirror,
+    FrameDecoder,
+    SpectatorServer,
+    SpectatorState,
+    decode_varint,
+    encode_varint,
+)
+
+
+def _make_engine(seed: int = 1) -> SnakeEngine:
+    """创建一个可复现的 AI 引擎。"""
+    return SnakeEngine(20, 15, auto_play=True, rng=random.Random(seed))
+
+
+class VarintTests(unittest.TestCase):
+    """varint 编解码测试。"""
+
+    def test_roundtrip(self):
+        """测试编码后能解码回原值。"""
+        out = bytearray()
+        values = [0, 1, 127, 128, 300, 16383, 16384, 2 ** 40]
+        for value in values:
+            encode_varint(value, out)
+        pos = 0
+        for value in values:
+            decoded, pos = decode_varint(out, pos)
+            self.assertEqual(decoded, value)
+        self.assertEqual(pos, len(out))
+
+    def test_small_values_use_one_byte(self):
+        """测试小于 128 的值只占一个字节。"""
+        out = bytearray()
+        encode_varint(127, out)
+        self.assertEqual(len(out), 1)
+
+    def test_negative_rejected(self):
+        """测试负数会被拒绝。"""
+        with self.assertRaises(ValueError):
+            encode_varint(-1, bytearray())
+
+
+class FrameStreamTests(unittest.TestCase):
+    """关键帧与增量帧重建状态测试。"""
+
+    def test_deltas_reproduce_engine_state(self):
+        """测试关键帧加增量帧能还原引擎状态。"""
+        engine = _make_engine()
+        steps = []
+        engine.add_listener(_Recorder(steps))
+        engine.reset()
+
+        mirror = BoardMirror()
+        mirror.load(engine.cols, engine.rows, engine.snake, engine.food, 0, 0, False)
+        stream = bytearray(mirror.encode_keyframe())
+        for _ in range(200):
+            if engine.game_over:
+                break
+            engine.step()
+        for head, tail_removed, food in steps:
+            stream += mirror.apply_step(head, tail_removed, food, False)
+
+        # 逐字节喂入，验证分包处理
+        state = SpectatorState()
+        decoder = FrameDecoder()
+        for i in range(len(stream)):
+            for payload in decoder.feed(stream[i:i + 1]):
+                state.apply(payload)
+
+        self.assertEqual(state.cells(), engine.snake)
+        self.assertEqual(state.food(), engine.food)
+        self.assertEqual(state.mirror.score, engine.score)
+
+    def test_delta_size_independent_of_length(self):
+        """测试增量帧大小与蛇长无关。"""
+        mirror = BoardMirror()
+        mirror.load(30, 20, [(x, 5) for x in range(3)], (5, 15), 0, 0, False)
+        short = mirror.apply_step((3, 5), True, (5, 15), False)
+        mirror.load(30, 20, [(x, y) for y in range(10) for x in range(30)], (5, 15), 0, 0, False)
+        long = mirror.apply_step((0, 10), True, (5, 15), False)
+        self.assertEqual(len(short), len(long))
+        self.assertLessEqual(len(long), 5)
+
+
+class _Recorder:
+    """记录每个 tick 的变化。"""
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def on_reset(self, engine):
+        pass
+
+    def on_step(self, engine, new_head, removed_tail):
+        self.steps.append((new_head, removed_tail is not None, engine.food))
+
+    def on_game_over(self, engine):
+        pass
+
+
+class SpectatorServerTests(unittest.TestCase):
+    """观战服务器网络测试。"""
+
+    def test_viewers_follow_game(self):
+        """测试多个观众都能同步到引擎状态。"""
+
+        async def scenario():
+            server = SpectatorServer(port=0)
+            await server.start()
+            engine = _make_engine(seed=3)
+            engine.add_listener(server)
+            engine.reset()
+
+            viewers = [await asyncio.open_connection(server.host, server.port) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            for _ in range(50):
+                if engine.game_over:
+                    break
+                engine.step()
+                await asyncio.sleep(0)
+            await asyncio.sleep(0.1)
+
+            states = []
+            for reader, writer in viewers:
+                state = SpectatorState()
+                decoder = FrameDecoder()
+                data = await asyncio.wait_for(reader.read(65536), 1)
+                for payload in decoder.feed(data):
+                    state.apply(payload)
+                states.append(state)
+                writer.close()
+            await server.stop()
+            return engine, states
+
+        engine, states = asyncio.run(scenario())
+        for state in states:
+            self.assertTrue(state.synced)
+            self.assertEqual(state.cells(), engine.snake)
+            self.assertEqual(state.food(), engine.food)
+
+    def test_publish_does_not_touch_viewers(self):
+        """测试发布增量帧只写共享环形缓冲，不逐个处理观众。"""
+
+        async def scenario():
+            server = SpectatorServer(port=0)
+            await server.start()
+            engine = _make_engine(seed=4)
+            engine.add_listener(server)
+            engine.reset()
+
+            viewers = [await asyncio.open_connection(server.host, server.port) for _ in range(5)]
+            await asyncio.sleep(0.05)
+            cursors = [client.cursor for client in server.clients]
+            for _ in range(10):
+                engine.step()
+            # 未让出事件循环，观众协程还没有运行
+            after = [client.cursor for client in server.clients]
+            for _, writer in viewers:
+                writer.close()
+            await server.stop()
+            return cursors, after
+
+        cursors, after = asyncio.run(scenario())
+        self.assertEqual(len(cursors), 5)
+        self.assertEqual(cursors, after)
+
+    def test_slow_viewer_drops_frames_then_resyncs(self):
+        """测试慢速观众被丢帧后通过关键帧重新同步。"""
+
+        async def scenario():
+            server = SpectatorServer(port=0, max_pending_frames=2)
+            await server.start()
+            engine = _make_engine(seed=5)
+            engine.add_listener(server)
+            engine.reset()
+
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            await asyncio.sleep(0.05)
+            # 不让出事件循环，模拟观众来不及接收
+            for _ in range(20):
+                if engine.game_over:
+                    break
+                engine.step()
+            await asyncio.sleep(0.1)
+
+            state = SpectatorState()
+            decoder = FrameDecoder()
+            data = await asyncio.wait_for(reader.read(65536), 1)
+            for payload in decoder.feed(data):
+                state.apply(payload)
+            writer.close()
+            await server.stop()
+            return engine, server, state
+
+        engine, server, state = asyncio.run(scenario())
+        self.assertGreater(server.frames_dropped, 0)
+        self.assertEqual(state.cells(), engine.snake)
+        self.assertEqual(state.food(), engine.food)
+
+
+if __name__ == "__main__":
+    unittest.main()